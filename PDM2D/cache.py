@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from voci import Voce
+
+
+class CacheRicerche:
+    """Cache LRU dei risultati per prefisso, limitata per numero di voci, dimensione e durata.
+
+    Un prefisso più lungo di uno già in cache viene servito filtrando in memoria
+    i risultati del prefisso più corto, senza accedere al file system.
+    """
+
+    def __init__(self, max_voci: int, max_byte: int, durata_secondi: float,
+                 filtra: Callable[[list, str], list]):
+        self.max_voci = max_voci
+        self.max_byte = max_byte
+        self.durata_secondi = durata_secondi
+        self._filtra = filtra
+        self._voci: "OrderedDict[str, Tuple[float, list, int]]" = OrderedDict()
+        self._byte = 0
+        self._lock = threading.Lock()
+        self.hit = 0
+        self.miss = 0
+
+    @property
+    def abilitata(self) -> bool:
+        return self.max_voci > 0
+
+    def leggi(self, prefisso: str) -> Optional[list]:
+        """Restituisce i risultati del prefisso, o di un suo prefisso più corto filtrati, se presenti"""
+        if not self.abilitata:
+            return None
+
+        with self._lock:
+            for lunghezza in range(len(prefisso), 0, -1):
+                chiave = prefisso[:lunghezza]
+                voce = self._voci.get(chiave)
+                if voce is None:
+                    continue
+                if self.durata_secondi and time.monotonic() - voce[0] > self.durata_secondi:
+                    self._rimuovi(chiave)
+                    continue
+                self._voci.move_to_end(chiave)
+                self.hit += 1
+                risultati = voce[1]
+                break
+            else:
+                self.miss += 1
+                return None
+
+        return list(risultati) if chiave == prefisso else self._filtra(risultati, prefisso)
+
+    def scrivi(self, prefisso: str, risultati: list) -> None:
+        if not self.abilitata:
+            return
+
+        # Dimensione stimata dalla lunghezza dei percorsi e degli avvisi
+        dimensione = sum(len(voce.percorso if isinstance(voce, Voce) else voce) for voce in risultati)
+        if self.max_byte and dimensione > self.max_byte:
+            return
+
+        with self._lock:
+            if prefisso in self._voci:
+                self._rimuovi(prefisso)
+            self._voci[prefisso] = (time.monotonic(), list(risultati), dimensione)
+            self._byte += dimensione
+            while len(self._voci) > self.max_voci or (self.max_byte and self._byte > self.max_byte):
+                self._rimuovi(next(iter(self._voci)))
+
+    def invalida(self) -> None:
+        with self._lock:
+            self._voci.clear()
+            self._byte = 0
+
+    def statistiche(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hit": self.hit, "miss": self.miss, "voci": len(self._voci), "byte": self._byte}
+
+    def _rimuovi(self, chiave: str) -> None:
+        _, _, dimensione = self._voci.pop(chiave)
+        self._byte -= dimensione
@@ -14,22 +14,88 @@ def get_env_list(key):
         return []
     return [item.strip() for item in value.split(',') if item.strip()]
 
-def get_env_float(key):
+def get_env_float(key, default=0.0):
     """Converte una variabile di ambiente in float"""
     try:
-        return float(os.getenv(key, "0"))
+        return float(os.getenv(key, str(default)))
     except (ValueError, TypeError):
-        return 0.0
+        return default
 
-def get_env_int(key):
+def get_env_int(key, default=0):
     """Converte una variabile di ambiente in int"""
     try:
-        return int(os.getenv(key, "0"))
+        return int(os.getenv(key, str(default)))
     except (ValueError, TypeError):
-        return 0
+        return default
+
+def get_env_bool(key):
+    """Converte una variabile di ambiente in bool"""
+    return os.getenv(key, "").strip().lower() in ("1", "true", "si", "sì", "yes", "on")
 
 # === CONFIGURAZIONE PERCORSI ===
 CARTELLE_DA_CERCARE = get_env_list('CARTELLE_DA_CERCARE')
+# Sottocartelle da non scansionare né indicizzare (glob o re:espressione, sul nome o sul percorso relativo)
+CARTELLE_ESCLUSE = get_env_list('CARTELLE_ESCLUSE')
+
+# === CONFIGURAZIONE RICERCA ===
+SEARCH_CONFIG = {
+    'max_threads': get_env_int('RICERCA_THREAD_MASSIMI') or 8,
+    'root_timeout_seconds': get_env_float('RICERCA_TIMEOUT_CARTELLA_SECONDI', 30),
+    'probe_timeout_seconds': get_env_float('RICERCA_TIMEOUT_VERIFICA_SECONDI', 3),
+    'probe_cache_seconds': get_env_float('RICERCA_VERIFICA_CACHE_SECONDI', 30),
+    'summaries': get_env_bool('RICERCA_RIASSUNTI'),
+    'summaries_verify_seconds': get_env_float('RICERCA_RIASSUNTI_VERIFICA_SECONDI', 300),
+    'batch_size': get_env_int('RICERCA_BLOCCO_RISULTATI') or 200,
+    'batch_interval_ms': get_env_int('RICERCA_INTERVALLO_BLOCCHI_MS') or 100,
+    'as_you_type': get_env_bool('RICERCA_DURANTE_DIGITAZIONE'),
+    'typing_delay_ms': get_env_int('RICERCA_RITARDO_DIGITAZIONE_MS') or 300,
+    'typing_min_chars': get_env_int('RICERCA_CARATTERI_MINIMI') or 3,
+    'normalize': get_env_bool('RICERCA_NORMALIZZATA'),
+    'cache_entries': get_env_int('RICERCA_CACHE_VOCI', 100),
+    'cache_mb': get_env_float('RICERCA_CACHE_MB', 50),
+    'cache_ttl_seconds': get_env_float('RICERCA_CACHE_DURATA_SECONDI', 300)
+}
+
+# === CONFIGURAZIONE INDICE ===
+INDEX_CONFIG = {
+    'enabled': get_env_bool('INDICE_ABILITATO'),
+    'type': os.getenv('INDICE_TIPO', 'sqlite').strip().lower(),
+    'path': os.getenv('INDICE_PERCORSO'),
+    'max_age_hours': get_env_float('INDICE_VALIDITA_ORE'),
+    'refresh_minutes': get_env_float('INDICE_AGGIORNAMENTO_MINUTI'),
+    'watch': get_env_bool('INDICE_OSSERVA_MODIFICHE'),
+    'trigrams': get_env_bool('INDICE_TRIGRAMMI'),
+    'watch_batch_ms': get_env_int('INDICE_OSSERVA_RAGGRUPPA_MS', 1000),
+    'watch_poll_seconds': get_env_float('INDICE_OSSERVA_POLLING_SECONDI', 60),
+    'shared_path': os.getenv('INDICE_CONDIVISO_PERCORSO'),
+    'shared_max_age_hours': get_env_float('INDICE_CONDIVISO_VALIDITA_ORE', 26),
+    'shared_max_deltas': get_env_int('INDICE_CONDIVISO_DELTA_MASSIMI', 24),
+    'exclude': CARTELLE_ESCLUSE
+}
+
+# === CONFIGURAZIONE SERVIZIO DI INDICIZZAZIONE ===
+SERVICE_CONFIG = {
+    'enabled': get_env_bool('SERVIZIO_ABILITATO'),
+    'host': os.getenv('SERVIZIO_HOST', '127.0.0.1').strip() or '127.0.0.1',
+    'port': get_env_int('SERVIZIO_PORTA', 47800),
+    'timeout_seconds': get_env_float('SERVIZIO_TIMEOUT_SECONDI', 2)
+}
+
+# === CONFIGURAZIONE REGISTRO DELLE RICERCHE ===
+LOG_CONFIG = {
+    'path': os.getenv('REGISTRO_PERCORSO'),
+    'max_mb': get_env_float('REGISTRO_DIMENSIONE_MB', 5),
+    'backups': get_env_int('REGISTRO_FILE_CONSERVATI', 3)
+}
+
+# === CONFIGURAZIONE RAGGRUPPAMENTO RISULTATI ===
+GROUPING_CONFIG = {
+    'mode': os.getenv('RISULTATI_RAGGRUPPAMENTO', 'nessuno').strip().lower(),
+    'attachments': [e.lower().lstrip('.') for e in get_env_list('RISULTATI_ESTENSIONI_ALLEGATI')] or ['pdf'],
+    'show_history': get_env_bool('RISULTATI_MOSTRA_STORICO'),
+    'collapse': get_env_bool('RISULTATI_SOLO_ULTIMA_VERSIONE'),
+    'newest_first': get_env_bool('RISULTATI_PIU_RECENTI_PRIMA')
+}
 
 # === INFORMAZIONI APPLICAZIONE ===
 APP_NAME = "Ricerca Disegni 2D"
@@ -62,7 +128,14 @@ MESSAGES = {
     'file_opened': os.getenv('FILE_OPENED'),
     'input_missing': os.getenv('INPUT_MISSING'),
     'insert_prefix': os.getenv('INSERT_PREFIX'),
-    'error_title': os.getenv('ERROR_TITLE')
+    'error_title': os.getenv('ERROR_TITLE'),
+    'index_updated': os.getenv('INDEX_UPDATED'),
+    'batch_header': os.getenv('BATCH_HEADER'),
+    'batch_missing': os.getenv('BATCH_MISSING'),
+    'batch_summary': os.getenv('BATCH_SUMMARY'),
+    'stats_crawl': os.getenv('STATS_CRAWL'),
+    'stats_index': os.getenv('STATS_INDEX'),
+    'stats_cache': os.getenv('STATS_CACHE')
 }
 
 # === TESTI INTERFACCIA ===
@@ -71,6 +144,16 @@ UI_TEXTS = {
     'subtitle': os.getenv('UI_SUBTITLE'),
     'prefix_label': os.getenv('PREFIX_LABEL'),
     'results_label': os.getenv('RESULTS_LABEL'),
+    'substring_search': os.getenv('SUBSTRING_SEARCH_LABEL'),
+    'show_history': os.getenv('SHOW_HISTORY_LABEL'),
+    'older_revisions': os.getenv('OLDER_REVISIONS_LABEL'),
+    'newest_first': os.getenv('NEWEST_FIRST_LABEL'),
+    'file_date': os.getenv('FILE_DATE_LABEL'),
+    'file_details': os.getenv('FILE_DETAILS_TOOLTIP'),
+    'stats_button': os.getenv('STATS_BUTTON'),
+    'batch_button': os.getenv('BATCH_BUTTON'),
+    'batch_title': os.getenv('BATCH_TITLE'),
+    'batch_prompt': os.getenv('BATCH_PROMPT'),
     'footer': f"Creato da {APP_AUTHOR} - Versione {APP_VERSION}"
 }
 
@@ -80,6 +163,9 @@ ERROR_MESSAGES = {
     'folder_not_exists': os.getenv('ERROR_FOLDER_NOT_EXISTS'),
     'permission_denied': os.getenv('ERROR_PERMISSION_DENIED'),
     'folder_access_error': os.getenv('ERROR_FOLDER_ACCESS'),
+    'folder_unreachable': os.getenv('ERROR_FOLDER_UNREACHABLE'),
+    'folder_timeout': os.getenv('ERROR_FOLDER_TIMEOUT'),
+    'invalid_exclusion': os.getenv('ERROR_INVALID_EXCLUSION'),
     'file_path_missing': os.getenv('ERROR_FILE_PATH_MISSING'),
     'invalid_file': os.getenv('ERROR_INVALID_FILE'),
     'file_not_found': os.getenv('ERROR_FILE_NOT_FOUND'),
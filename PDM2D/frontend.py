@@ -1,47 +1,228 @@
 import os
+import queue
+import threading
+import time
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget,
     QLabel, QLineEdit, QPushButton, QMessageBox,
-    QFrame, QListWidget, QListWidgetItem
+    QFrame, QListView, QAbstractItemView, QCheckBox, QMenu, QInputDialog
 )
-from PySide6.QtCore import Qt, QThread, Signal, QUrl, QMimeData
-from PySide6.QtGui import QDrag
+from PySide6.QtCore import (
+    Qt, QThread, Signal, QUrl, QMimeData, QTimer, QAbstractListModel, QModelIndex
+)
+from PySide6.QtGui import QDrag, QKeySequence, QShortcut
 from backend import FileSearcher
 from config import (
     WINDOW_TITLE, WINDOW_SCREEN_RATIO, WINDOW_POSITION_OFFSET_RATIO,
-    MESSAGES, UI_TEXTS, LAYOUT_CONFIG
+    MESSAGES, UI_TEXTS, LAYOUT_CONFIG, INDEX_CONFIG, SEARCH_CONFIG, SERVICE_CONFIG, GROUPING_CONFIG
 )
+from distribuzione import crea_indice_condiviso
+from index import crea_indice
+from servizio import crea_client
 from styles import get_application_styles
 from utils import create_app_icon
+from voci import Gruppo, chiave_gruppo, normalizza, piu_recenti, raggruppa
+
+# Percorsi da trascinare per una riga: il file principale e i suoi allegati
+PERCORSI_ROLE = Qt.UserRole + 1
+
+def _data_leggibile(modificato):
+    return time.strftime('%d/%m/%Y %H:%M', time.localtime(modificato))
+
+def _dimensione_leggibile(dimensione):
+    if dimensione < 1024:
+        return f"{dimensione} byte"
+    for unita in ('KB', 'MB', 'GB'):
+        dimensione /= 1024
+        if dimensione < 1024 or unita == 'GB':
+            return f"{dimensione:.1f} {unita}".replace('.', ',')
 
-class DragDropListWidget(QListWidget):
-    """QListWidget personalizzata con supporto per drag and drop"""
+class ResultsModel(QAbstractListModel):
+    """Modello dei risultati: conserva solo le voci, testo e tooltip sono calcolati quando la vista li chiede.
+    
+    Raggruppato mostra una riga per disegno (revisione più recente e allegati), altrimenti
+    una riga per file con le voci secondarie di ogni disegno rientrate.
+    """
+    
+    def __init__(self, is_avviso, parent=None):
+        super().__init__(parent)
+        self._is_avviso = is_avviso
+        self._voci = []
+        # Riga del gruppo di ogni disegno già mostrato, per unire i file che arrivano dopo
+        self._gruppi = {}
+        # Righe rientrate nella vista non raggruppata
+        self._secondarie = set()
+        # Righe di messaggio (es. nessun risultato) che non corrispondono a un file
+        self._messaggi = set()
+        self.raggruppa = not GROUPING_CONFIG['show_history']
+        # Con l'ordine per data ogni riga riporta anche la data di modifica del suo file
+        self.per_data = GROUPING_CONFIG['newest_first']
+        self.valid_files = 0
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._voci)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        
+        row = index.row()
+        file_path = self.file_path(row)
+        if role == Qt.DisplayRole:
+            if not file_path:
+                return self._voci[row]
+            if isinstance(self._voci[row], Gruppo):
+                testo = self._testo_gruppo(self._voci[row])
+            else:
+                testo = f"    {os.path.basename(file_path)}" if row in self._secondarie else os.path.basename(file_path)
+            voce = self.voci(row)[0]
+            if self.per_data and voce.modificato and UI_TEXTS['file_date']:
+                testo += " " + UI_TEXTS['file_date'].format(modificato=_data_leggibile(voce.modificato))
+            return testo
+        if role == Qt.ToolTipRole:
+            return self._tooltip(self.voci(row)[0]) if file_path else None
+        if role == Qt.UserRole:
+            return file_path
+        if role == PERCORSI_ROLE:
+            return self.percorsi(row)
+        return None
+    
+    @staticmethod
+    def _tooltip(voce):
+        testo = f"Percorso completo: {voce.percorso}"
+        # Dimensione e data arrivano con i risultati: il tooltip non accede al file
+        if voce.modificato and UI_TEXTS['file_details']:
+            testo += "\n" + UI_TEXTS['file_details'].format(
+                modificato=_data_leggibile(voce.modificato), dimensione=_dimensione_leggibile(voce.dimensione)
+            )
+        return testo
+    
+    @staticmethod
+    def _testo_gruppo(gruppo):
+        testo = os.path.basename(gruppo.principale.percorso)
+        for allegato in gruppo.allegati:
+            testo += f" + {os.path.splitext(allegato.percorso)[1].lstrip('.').upper()}"
+        if gruppo.precedenti and UI_TEXTS['older_revisions']:
+            revisioni = {voce.revisione for voce in gruppo.precedenti}
+            testo += " " + UI_TEXTS['older_revisions'].format(count=len(revisioni))
+        return testo
+    
+    def voci(self, row):
+        """Restituisce i file della riga, dalla revisione più recente; vuoto se la riga è un messaggio"""
+        voce = self._voci[row]
+        if row in self._messaggi or self._is_avviso(voce):
+            return []
+        return voce.ordinate() if isinstance(voce, Gruppo) else [voce]
+    
+    def file_path(self, row):
+        """Restituisce il percorso della riga, oppure None se la riga è un messaggio"""
+        voci = self.voci(row)
+        return voci[0].percorso if voci else None
+    
+    def percorsi(self, row):
+        voce = self._voci[row]
+        if isinstance(voce, Gruppo):
+            return [voce.principale.percorso] + [allegato.percorso for allegato in voce.allegati]
+        file_path = self.file_path(row)
+        return [file_path] if file_path else []
+    
+    def append(self, risultati, ordinati=False):
+        """Aggiunge un blocco di risultati con un solo inserimento.
+        
+        Con ordinati (ricerca completata) la vista non raggruppata elenca i file disegno per disegno.
+        """
+        if not risultati:
+            return
+        
+        first = len(self._voci)
+        nuove = []
+        modificate = []
+        for voce in risultati:
+            if self._is_avviso(voce):
+                nuove.append(voce)
+                continue
+            self.valid_files += 1
+            if not self.raggruppa:
+                nuove.append(voce)
+                continue
+            chiave = chiave_gruppo(voce)
+            row = self._gruppi.get(chiave)
+            if row is None:
+                self._gruppi[chiave] = first + len(nuove)
+                nuove.append(Gruppo(voce.base))
+                nuove[-1].aggiungi(voce)
+            elif row >= first:
+                nuove[row - first].aggiungi(voce)
+            else:
+                self._voci[row].aggiungi(voce)
+                modificate.append(row)
+        
+        if not self.raggruppa and ordinati:
+            nuove = []
+            for elemento in raggruppa(risultati):
+                if not isinstance(elemento, Gruppo):
+                    nuove.append(elemento)
+                    continue
+                voci = elemento.ordinate()
+                self._secondarie.update(range(first + len(nuove) + 1, first + len(nuove) + len(voci)))
+                nuove.extend(voci)
+        
+        if modificate:
+            self.dataChanged.emit(self.index(min(modificate)), self.index(max(modificate)))
+        if nuove:
+            self.beginInsertRows(QModelIndex(), first, first + len(nuove) - 1)
+            self._voci.extend(nuove)
+            self.endInsertRows()
+    
+    def append_message(self, testo):
+        """Aggiunge una riga di testo; i file successivi non vengono uniti ai gruppi precedenti"""
+        self._gruppi = {}
+        row = len(self._voci)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._voci.append(testo)
+        self._messaggi.add(row)
+        self.endInsertRows()
+    
+    def clear(self):
+        self.beginResetModel()
+        self._voci = []
+        self._gruppi = {}
+        self._secondarie = set()
+        self._messaggi = set()
+        self.valid_files = 0
+        self.endResetModel()
+
+class DragDropListView(QListView):
+    """QListView personalizzata con supporto per drag and drop"""
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setDragDropMode(QListWidget.DragOnly)
+        self.setDragDropMode(QAbstractItemView.DragOnly)
         self.setDefaultDropAction(Qt.CopyAction)
+        # Righe tutte della stessa altezza e layout a blocchi: la vista resta fluida anche con molti risultati
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
     
     def startDrag(self, supportedActions):
         """Avvia il drag and drop quando l'utente trascina un elemento"""
-        item = self.currentItem()
-        if not item:
+        index = self.currentIndex()
+        if not index.isValid():
             return
         
-        file_path = item.data(Qt.UserRole)
-        if not file_path:
+        # Un disegno raggruppato viene trascinato insieme ai suoi allegati
+        percorsi = index.data(PERCORSI_ROLE)
+        if not percorsi:
             return
         
         # Crea il drag object
         drag = QDrag(self)
         mimeData = QMimeData()
         
-        # Imposta l'URL del file per il drag and drop
-        url = QUrl.fromLocalFile(file_path)
-        mimeData.setUrls([url])
+        # Imposta gli URL dei file per il drag and drop
+        mimeData.setUrls([QUrl.fromLocalFile(percorso) for percorso in percorsi])
         
-        # Imposta anche il testo del percorso
-        mimeData.setText(file_path)
+        # Imposta anche il testo dei percorsi
+        mimeData.setText("\n".join(percorsi))
         
         drag.setMimeData(mimeData)
         
@@ -70,30 +251,156 @@ class DragDropListWidget(QListWidget):
         self.startDrag(Qt.CopyAction)
 
 class SearchThread(QThread):
-    search_completed = Signal(dict)
+    """Esegue la ricerca inviando i risultati a blocchi man mano che vengono trovati.
     
-    def __init__(self, file_searcher, search_prefix):
+    Ogni segnale riporta la generazione della ricerca, così la finestra può scartare
+    i risultati arrivati in ritardo da una ricerca ormai sostituita.
+    """
+    results_found = Signal(int, list)
+    search_completed = Signal(int, dict)
+    
+    def __init__(self, file_searcher, search_prefix, generazione=0, contiene=False):
         super().__init__()
         self.file_searcher = file_searcher
         self.search_prefix = search_prefix
+        self.generazione = generazione
+        self.contiene = contiene
+        self._annulla = threading.Event()
+    
+    def annulla(self):
+        """Chiede alla ricerca di fermarsi entro la cartella in corso di lettura"""
+        self._annulla.set()
+    
+    def run(self):
+        # Al termine la ricerca riempie ordinati con tutti i file nell'ordine definitivo
+        ordinati = []
+        blocco = []
+        # Il primo risultato viene inviato subito: è il tempo che l'utente percepisce
+        ultimo_invio = float('-inf')
+        intervallo = SEARCH_CONFIG['batch_interval_ms'] / 1000
+        
+        statistiche = {}
+        
+        # La ricerca gira in un altro thread: così un blocco parziale viene inviato allo scadere
+        # dell'intervallo anche se nel frattempo non arrivano altri risultati
+        coda = queue.Queue()
+        fine = object()
+        
+        def produci():
+            try:
+                for voce in self.file_searcher.cerca_file_iter(self.search_prefix, self._annulla, self.contiene,
+                                                               statistiche, ordinati):
+                    coda.put(voce)
+                coda.put(fine)
+            except Exception as e:
+                coda.put(e)
+        
+        threading.Thread(target=produci, daemon=True).start()
+        try:
+            while not self._annulla.is_set():
+                attesa = max(0, ultimo_invio + intervallo - time.monotonic()) if blocco else None
+                try:
+                    voce = coda.get(timeout=attesa)
+                except queue.Empty:
+                    self.results_found.emit(self.generazione, blocco)
+                    blocco = []
+                    ultimo_invio = time.monotonic()
+                    continue
+                if voce is fine:
+                    break
+                if isinstance(voce, Exception):
+                    raise voce
+                blocco.append(voce)
+                adesso = time.monotonic()
+                if len(blocco) >= SEARCH_CONFIG['batch_size'] or adesso - ultimo_invio >= intervallo:
+                    self.results_found.emit(self.generazione, blocco)
+                    blocco = []
+                    ultimo_invio = adesso
+            if self._annulla.is_set():
+                return
+            if blocco:
+                self.results_found.emit(self.generazione, blocco)
+            self.search_completed.emit(self.generazione, {"risultati": ordinati, "statistiche": statistiche})
+        except ValueError as e:
+            self.search_completed.emit(self.generazione, {"errore": str(e)})
+        except Exception as e:
+            self.search_completed.emit(self.generazione, {"errore": f"Errore durante la ricerca: {str(e)}"})
+
+class BatchSearchThread(QThread):
+    """Cerca un elenco di codici con un solo passaggio e invia il resoconto completo"""
+    search_completed = Signal(int, dict)
+    
+    def __init__(self, file_searcher, prefissi, generazione=0):
+        super().__init__()
+        self.file_searcher = file_searcher
+        self.prefissi = prefissi
+        self.generazione = generazione
+        self._annulla = threading.Event()
+    
+    def annulla(self):
+        self._annulla.set()
     
     def run(self):
         try:
-            risultato = self.file_searcher.cerca_file(self.search_prefix)
-            self.search_completed.emit(risultato)
+            risultato = self.file_searcher.cerca_molti(self.prefissi, self._annulla)
+            if not self._annulla.is_set():
+                self.search_completed.emit(self.generazione, risultato)
         except Exception as e:
-            self.search_completed.emit({"errore": f"Errore durante la ricerca: {str(e)}"})
+            self.search_completed.emit(self.generazione, {"errore": f"Errore durante la ricerca: {str(e)}"})
+
+class IndexThread(QThread):
+    """Costruisce o aggiorna l'indice dei file in background senza bloccare l'interfaccia.
+    
+    Dopo la prima indicizzazione avvia anche gli osservatori: elencare l'albero da
+    osservare o verificare una condivisione scollegata bloccherebbe la finestra.
+    """
+    index_updated = Signal(dict)
+    
+    def __init__(self, file_searcher):
+        super().__init__()
+        self.file_searcher = file_searcher
+        self._annulla = threading.Event()
+    
+    def annulla(self):
+        self._annulla.set()
+    
+    def run(self):
+        try:
+            statistiche = self.file_searcher.aggiorna_indice(self._annulla)
+            if self._annulla.is_set():
+                return
+            self.index_updated.emit(statistiche)
+            # Dopo la prima indicizzazione l'indice viene tenuto aggiornato dagli osservatori
+            if INDEX_CONFIG['watch'] and not self.file_searcher.osservatori:
+                self.file_searcher.avvia_osservatori()
+        except Exception:
+            # Senza indice la ricerca continua a scansionare le cartelle
+            pass
 
 class SearchGUI(QMainWindow):
     
     def __init__(self, cartelle_da_cercare=None):
         super().__init__()
-        self.file_searcher = FileSearcher()
+        self.file_searcher = FileSearcher(indice=crea_indice(INDEX_CONFIG), servizio=crea_client(SERVICE_CONFIG),
+                                         indice_condiviso=crea_indice_condiviso(INDEX_CONFIG))
         self.file_searcher.set_cartelle(cartelle_da_cercare or [])
         self.search_thread = None
+        self.search_generation = 0
+        # Ricerca mostrata nella lista: prefisso cercato, risultati completi e filtro digitato
+        self._search_prefix = None
+        self._search_results = []
+        self._search_done = False
+        self._search_contiene = False
+        self._filter_prefix = None
+        # Elenco di codici mostrato nella lista e il suo resoconto, se l'ultima ricerca è stata per elenco
+        self._batch_prefissi = None
+        self._batch_result = None
+        # Ricerche sostituite ancora in chiusura: il riferimento evita che il QThread venga distrutto mentre gira
+        self._stopping_threads = set()
         self._setup_window()
         self._setup_ui()
         self.setStyleSheet(get_application_styles())
+        self._avvia_indicizzazione()
     
     def _setup_window(self):
         """Configura la finestra principale adattandola allo schermo"""
@@ -126,6 +433,29 @@ class SearchGUI(QMainWindow):
         self.main_layout.setSpacing(LAYOUT_CONFIG['main_spacing'])
         self.main_layout.setContentsMargins(*LAYOUT_CONFIG['main_margins'])
     
+    def _avvia_indicizzazione(self):
+        """Avvia la costruzione dell'indice e il suo aggiornamento periodico, se abilitato"""
+        self.index_thread = None
+        if self.file_searcher.indice is None:
+            return
+        
+        self._aggiorna_indice()
+        if INDEX_CONFIG['refresh_minutes'] > 0:
+            self.index_timer = QTimer(self)
+            self.index_timer.timeout.connect(self._aggiorna_indice)
+            self.index_timer.start(int(INDEX_CONFIG['refresh_minutes'] * 60 * 1000))
+    
+    def _aggiorna_indice(self):
+        if self.index_thread is not None and self.index_thread.isRunning():
+            return
+        
+        self.index_thread = IndexThread(self.file_searcher)
+        self.index_thread.index_updated.connect(self._on_index_updated)
+        self.index_thread.start()
+    
+    def _on_index_updated(self, statistiche):
+        self.info_label.setToolTip(MESSAGES['index_updated'].format(**statistiche))
+    
     def _set_window_icon(self):
         self.setWindowIcon(create_app_icon())
     
@@ -134,6 +464,16 @@ class SearchGUI(QMainWindow):
         self._create_search_section()
         self._create_results_section()
         self.entry_prefisso.setFocus()
+        
+        QShortcut(QKeySequence.Refresh, self, self.aggiorna)
+    
+    def aggiorna(self):
+        """Svuota la cache, aggiorna l'indice e ripete la ricerca corrente"""
+        self.file_searcher.invalida_cache()
+        if self.file_searcher.indice is not None:
+            self._aggiorna_indice()
+        if self.entry_prefisso.text().strip():
+            self.avvia_ricerca()
     
     def _create_header(self):
         header_frame = QFrame()
@@ -169,12 +509,30 @@ class SearchGUI(QMainWindow):
         self.entry_prefisso.returnPressed.connect(self.avvia_ricerca)
         input_layout.addWidget(self.entry_prefisso)
         
+        if SEARCH_CONFIG['as_you_type']:
+            self.typing_timer = QTimer(self)
+            self.typing_timer.setSingleShot(True)
+            self.typing_timer.setInterval(SEARCH_CONFIG['typing_delay_ms'])
+            self.typing_timer.timeout.connect(self._ricerca_incrementale)
+            self.entry_prefisso.textChanged.connect(self.typing_timer.start)
+        
         self.btn_cerca = QPushButton(MESSAGES['search_button'])
         self.btn_cerca.setObjectName("searchButton")
         self.btn_cerca.clicked.connect(self.avvia_ricerca)
         input_layout.addWidget(self.btn_cerca)
         
+        self.btn_elenco = QPushButton(UI_TEXTS['batch_button'])
+        self.btn_elenco.setObjectName("batchButton")
+        self.btn_elenco.clicked.connect(self.cerca_elenco)
+        input_layout.addWidget(self.btn_elenco)
+        
         search_layout.addLayout(input_layout)
+        
+        self.check_contiene = QCheckBox(UI_TEXTS['substring_search'])
+        self.check_contiene.setObjectName("substringCheck")
+        self.check_contiene.toggled.connect(self._toggle_substring)
+        search_layout.addWidget(self.check_contiene)
+        
         self.main_layout.addWidget(search_frame)
     
     def _create_results_section(self):
@@ -183,18 +541,57 @@ class SearchGUI(QMainWindow):
         results_frame.setMinimumHeight(LAYOUT_CONFIG['results_section_min_height'])
         results_layout = QVBoxLayout(results_frame)
         
+        self.modello_risultati = ResultsModel(self.file_searcher.is_avviso, self)
+        
+        label_layout = QHBoxLayout()
         results_label = QLabel(UI_TEXTS['results_label'])
         results_label.setObjectName("resultsLabel")
-        results_layout.addWidget(results_label)
-        
-        self.list_risultati = DragDropListWidget()
+        label_layout.addWidget(results_label)
+        label_layout.addStretch()
+        
+        self.check_recenti = QCheckBox(UI_TEXTS['newest_first'])
+        self.check_recenti.setObjectName("newestCheck")
+        self.check_recenti.setChecked(self.modello_risultati.per_data)
+        self.check_recenti.toggled.connect(self._toggle_newest_first)
+        label_layout.addWidget(self.check_recenti)
+        
+        # Senza raggruppamento ogni file è già un gruppo a sé: la scelta non serve
+        if GROUPING_CONFIG['mode'] != 'nessuno':
+            self.check_storico = QCheckBox(UI_TEXTS['show_history'])
+            self.check_storico.setObjectName("historyCheck")
+            self.check_storico.setChecked(not self.modello_risultati.raggruppa)
+            self.check_storico.toggled.connect(self._toggle_history)
+            label_layout.addWidget(self.check_storico)
+        results_layout.addLayout(label_layout)
+        
+        self.list_risultati = DragDropListView()
         self.list_risultati.setObjectName("resultsList")
-        self.list_risultati.itemDoubleClicked.connect(self._handle_item_double_click)
+        self.list_risultati.setModel(self.modello_risultati)
+        self.list_risultati.doubleClicked.connect(self._handle_item_double_click)
+        self.list_risultati.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.list_risultati.customContextMenuRequested.connect(self._show_context_menu)
         results_layout.addWidget(self.list_risultati, 1)
         
+        info_layout = QHBoxLayout()
         self.info_label = QLabel(MESSAGES['double_click_info'])
         self.info_label.setObjectName("infoLabel")
-        results_layout.addWidget(self.info_label)
+        info_layout.addWidget(self.info_label, 1)
+        
+        # Tempi della ricerca per cartella, visibili su richiesta per capire quale condivisione rallenta
+        self.btn_dettagli = QPushButton(UI_TEXTS['stats_button'])
+        self.btn_dettagli.setObjectName("statsButton")
+        self.btn_dettagli.setCheckable(True)
+        self.btn_dettagli.setVisible(False)
+        self.btn_dettagli.toggled.connect(self._toggle_statistiche)
+        info_layout.addWidget(self.btn_dettagli)
+        results_layout.addLayout(info_layout)
+        
+        self.pannello_statistiche = QLabel()
+        self.pannello_statistiche.setObjectName("statsPanel")
+        self.pannello_statistiche.setWordWrap(True)
+        self.pannello_statistiche.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.pannello_statistiche.setVisible(False)
+        results_layout.addWidget(self.pannello_statistiche)
         
         self.main_layout.addWidget(results_frame, 1)
         self._create_footer()
@@ -223,68 +620,274 @@ class SearchGUI(QMainWindow):
             QMessageBox.warning(self, MESSAGES['input_missing'], MESSAGES['insert_prefix'])
             return
         
+        if SEARCH_CONFIG['as_you_type']:
+            self.typing_timer.stop()
+        self._start_search(search_prefix)
+    
+    def cerca_elenco(self):
+        """Chiede un elenco di codici (es. una distinta base) e li cerca tutti insieme"""
+        testo, confermato = QInputDialog.getMultiLineText(
+            self, UI_TEXTS['batch_title'], UI_TEXTS['batch_prompt'], "\n".join(self._batch_prefissi or [])
+        )
+        if not confermato:
+            return
+        
+        prefissi = self.file_searcher.leggi_elenco(testo)
+        if not prefissi:
+            QMessageBox.warning(self, MESSAGES['input_missing'], MESSAGES['insert_prefix'])
+            return
+        
+        if SEARCH_CONFIG['as_you_type']:
+            self.typing_timer.stop()
+        self._start_batch(prefissi)
+    
+    def _start_batch(self, prefissi):
+        self._annulla_ricerca()
+        self._set_search_state(True)
+        
+        # La lista mostra l'elenco: la digitazione non filtra questi risultati
+        self._search_prefix = None
+        self._filter_prefix = None
+        self._search_results = []
+        self._batch_prefissi = prefissi
+        self._batch_result = None
+        self.search_generation += 1
+        self.search_thread = BatchSearchThread(self.file_searcher, prefissi, self.search_generation)
+        self.search_thread.search_completed.connect(self._on_batch_completed)
+        self.search_thread.start()
+    
+    def _on_batch_completed(self, generazione, risultato):
+        if generazione != self.search_generation:
+            return
+        
+        self._set_search_state(False)
+        if "errore" in risultato:
+            QMessageBox.critical(self, MESSAGES['error_title'], risultato["errore"])
+            self.info_label.setText(MESSAGES['error_prefix'])
+            return
+        
+        self._batch_result = risultato
+        self._mostra_elenco()
+        self._mostra_statistiche(risultato["statistiche"])
+    
+    def _mostra_elenco(self):
+        """Mostra i codici non trovati e, codice per codice, i file trovati"""
+        risultato = self._batch_result
+        self.modello_risultati.clear()
+        for prefisso in risultato["mancanti"]:
+            self.modello_risultati.append_message(MESSAGES['batch_missing'].format(prefix=prefisso))
+        self.modello_risultati.append(risultato["avvisi"])
+        for prefisso, voci in risultato["risultati"].items():
+            if voci:
+                self.modello_risultati.append_message(
+                    MESSAGES['batch_header'].format(prefix=prefisso, count=len(voci))
+                )
+                self.modello_risultati.append(self._ordina(voci), ordinati=True)
+        
+        totale = len(risultato["risultati"])
+        self.info_label.setText(
+            MESSAGES['batch_summary'].format(found=totale - len(risultato["mancanti"]), total=totale)
+        )
+    
+    def _ricerca_incrementale(self):
+        """Ricerca durante la digitazione: se il prefisso estende quello già cercato filtra i risultati in memoria"""
+        search_prefix = self.entry_prefisso.text().strip()
+        
+        if len(search_prefix) < SEARCH_CONFIG['typing_min_chars']:
+            return
+        
+        if self._restringe_ricerca(search_prefix):
+            if search_prefix != self._filter_prefix:
+                self._filter_prefix = search_prefix
+                self._refresh_results()
+            return
+        
+        self._start_search(search_prefix)
+    
+    def _restringe_ricerca(self, search_prefix):
+        """Indica se i risultati del nuovo testo sono un sottoinsieme di quelli della ricerca mostrata"""
+        if not self._search_prefix or self._search_contiene != self.check_contiene.isChecked():
+            return False
+        if self._search_contiene:
+            return normalizza(self._search_prefix) in normalizza(search_prefix)
+        return normalizza(search_prefix).startswith(normalizza(self._search_prefix))
+    
+    def _toggle_substring(self):
+        if self.entry_prefisso.text().strip():
+            self._start_search(self.entry_prefisso.text().strip())
+    
+    def _start_search(self, search_prefix):
+        self._annulla_ricerca()
         self._set_search_state(True)
         
-        self.search_thread = SearchThread(self.file_searcher, search_prefix)
+        self._search_prefix = search_prefix
+        self._filter_prefix = search_prefix
+        self._search_results = []
+        self._search_done = False
+        self._batch_prefissi = None
+        self._batch_result = None
+        self._search_contiene = self.check_contiene.isChecked()
+        self.search_generation += 1
+        self.search_thread = SearchThread(
+            self.file_searcher, search_prefix, self.search_generation, self._search_contiene
+        )
+        self.search_thread.results_found.connect(self._on_results_found)
         self.search_thread.search_completed.connect(self._on_search_completed)
         self.search_thread.start()
     
+    def _annulla_ricerca(self):
+        """Interrompe la ricerca in corso: i suoi risultati tardivi verranno scartati"""
+        thread = self.search_thread
+        self.search_thread = None
+        if thread is None or thread.isFinished():
+            return
+        
+        thread.annulla()
+        self._stopping_threads.add(thread)
+        thread.finished.connect(self._on_thread_stopped)
+    
+    def _on_thread_stopped(self):
+        self._stopping_threads.discard(self.sender())
+    
     def _set_search_state(self, is_searching):
         if is_searching:
             self.btn_cerca.setEnabled(False)
+            self.btn_elenco.setEnabled(False)
             self.btn_cerca.setText(MESSAGES['searching'])
-            self.list_risultati.clear()
+            self.modello_risultati.clear()
             self.info_label.setText(MESSAGES['searching'])
+            self.btn_dettagli.setVisible(False)
+            self.pannello_statistiche.setVisible(False)
         else:
             self.btn_cerca.setEnabled(True)
+            self.btn_elenco.setEnabled(True)
             self.btn_cerca.setText(MESSAGES['search_button'])
             self.info_label.setText(MESSAGES['double_click_info'])
     
-    def _on_search_completed(self, risultato):
+    def _on_results_found(self, generazione, risultati):
+        if generazione != self.search_generation:
+            return
+        
+        self._search_results.extend(risultati)
+        self.modello_risultati.append(self._filter_results(risultati))
+        self.info_label.setText(
+            f"{MESSAGES['searching']} {MESSAGES['success_prefix']} {self.modello_risultati.valid_files} file"
+        )
+    
+    def _on_search_completed(self, generazione, risultato):
+        if generazione != self.search_generation:
+            return
+        
         self._set_search_state(False)
         
         if "errore" in risultato:
+            self._search_prefix = None
             QMessageBox.critical(self, MESSAGES['error_title'], risultato["errore"])
             self.info_label.setText(MESSAGES['error_prefix'])
             return
         
-        self._display_results(risultato["risultati"])
+        self._search_done = True
+        # I blocchi sono arrivati nell'ordine di completamento: la lista viene ridisegnata
+        # nell'ordine definitivo, lo stesso di una ricerca servita dalla cache
+        self._search_results = risultato["risultati"]
+        self._mostra_statistiche(risultato["statistiche"])
+        self._refresh_results()
     
-    def _display_results(self, risultati):
-        self.list_risultati.clear()
-        
-        if not risultati:
-            item = QListWidgetItem(MESSAGES['no_results'])
-            item.setData(Qt.UserRole, None)
-            self.list_risultati.addItem(item)
+    def _mostra_statistiche(self, statistiche):
+        """Prepara il pannello dei dettagli con una riga per cartella"""
+        if not statistiche:
+            righe = [MESSAGES['stats_cache']]
+        else:
+            righe = []
+            for cartella, valori in statistiche.items():
+                messaggio = MESSAGES['stats_crawl'] if valori["origine"] == "scansione" else MESSAGES['stats_index']
+                valori = dict(valori, root=cartella, cartella_lenta=valori["cartella_lenta"] or "-")
+                righe.append(messaggio.format(**valori))
+        self.pannello_statistiche.setText("\n".join(righe))
+        self.btn_dettagli.setVisible(True)
+        self.pannello_statistiche.setVisible(self.btn_dettagli.isChecked())
+    
+    def _toggle_statistiche(self, mostra):
+        self.pannello_statistiche.setVisible(mostra)
+    
+    def _toggle_history(self, mostra):
+        self.modello_risultati.raggruppa = not mostra
+        if GROUPING_CONFIG['collapse']:
+            # Le versioni precedenti non sono tra i risultati ricevuti: la ricerca viene ripetuta,
+            # di norma servita dalla cache
+            self.file_searcher.mostra_storico = mostra
+            if self._batch_prefissi:
+                self._start_batch(self._batch_prefissi)
+                return
+            if self._filter_prefix:
+                self._start_search(self._filter_prefix)
+                return
+        if self._batch_result is not None:
+            self._mostra_elenco()
+            return
+        self._refresh_results()
+    
+    def _toggle_newest_first(self, attivo):
+        self.modello_risultati.per_data = attivo
+        if self._batch_result is not None:
+            self._mostra_elenco()
+        elif self._search_prefix:
+            self._refresh_results()
+    
+    def _ordina(self, risultati):
+        """Con l'ordine per data i file modificati più di recente vanno per primi, senza leggere i file"""
+        return piu_recenti(risultati) if self.modello_risultati.per_data else risultati
+    
+    def _refresh_results(self):
+        """Ridisegna la lista applicando il filtro corrente ai risultati già ricevuti"""
+        self.modello_risultati.clear()
+        risultati = self._filter_results(self._search_results)
+        if self._search_done:
+            # Durante la ricerca i file restano nell'ordine di arrivo, per non far saltare la lista
+            risultati = self._ordina(risultati)
+        self.modello_risultati.append(risultati, ordinati=self._search_done)
+        if self._search_done:
+            self._show_summary()
+        else:
+            self.info_label.setText(
+                f"{MESSAGES['searching']} {MESSAGES['success_prefix']} {self.modello_risultati.valid_files} file"
+            )
+    
+    def _filter_results(self, risultati):
+        if self._filter_prefix == self._search_prefix:
+            return risultati
+        return self.file_searcher.filtra_risultati(risultati, self._filter_prefix, self._search_contiene)
+    
+    def _show_summary(self):
+        if self.modello_risultati.rowCount() == 0:
+            self.modello_risultati.append_message(MESSAGES['no_results'])
             self.info_label.setText(MESSAGES['no_results'])
             return
         
-        # Crea tutti gli item in una volta sola
-        items = []
-        valid_files = 0
-        
-        for file_path in risultati:
-            item = QListWidgetItem()
-            if file_path.startswith(("Attenzione:", "Errore:")):
-                item.setText(file_path)
-                item.setData(Qt.UserRole, None)
-            else:
-                item.setText(os.path.basename(file_path))
-                item.setToolTip(f"Percorso completo: {file_path}")
-                item.setData(Qt.UserRole, file_path)
-                valid_files += 1
-            items.append(item)
+        self.info_label.setText(f"{MESSAGES['success_prefix']} {self.modello_risultati.valid_files} file")
+    
+    def _handle_item_double_click(self, index):
+        self._apri_file(index.data(Qt.UserRole))
+    
+    def _show_context_menu(self, posizione):
+        """Elenca tutti i file del disegno, revisioni precedenti comprese, per aprirne uno"""
+        index = self.list_risultati.indexAt(posizione)
+        if not index.isValid():
+            return
         
-        # Aggiungi tutti gli item in una volta
-        for item in items:
-            self.list_risultati.addItem(item)
+        voci = self.modello_risultati.voci(index.row())
+        if not voci:
+            return
         
-        self.info_label.setText(f"{MESSAGES['success_prefix']} {valid_files} file")
+        menu = QMenu(self)
+        for voce in voci:
+            azione = menu.addAction(os.path.basename(voce.percorso))
+            azione.setToolTip(voce.percorso)
+            azione.triggered.connect(lambda _=False, percorso=voce.percorso: self._apri_file(percorso))
+        menu.exec_(self.list_risultati.viewport().mapToGlobal(posizione))
     
-    def _handle_item_double_click(self, item):
+    def _apri_file(self, file_path):
         try:
-            file_path = item.data(Qt.UserRole)
             if not file_path:
                 return
             
@@ -296,5 +899,19 @@ class SearchGUI(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, MESSAGES['error_title'], f"Si è verificato un errore:\n{str(e)}")
     
+    def closeEvent(self, event):
+        """Interrompe ricerca e indicizzazione prima di chiudere la finestra"""
+        self._annulla_ricerca()
+        if self.index_thread is not None:
+            self.index_thread.annulla()
+        for thread in [*self._stopping_threads, self.index_thread]:
+            if thread is not None:
+                thread.wait()
+        # Dopo l'indicizzazione, che potrebbe averli appena avviati
+        self.file_searcher.ferma_osservatori()
+        if self.file_searcher.indice is not None:
+            self.file_searcher.indice.chiudi()
+        super().closeEvent(event)
+    
     def run(self):
         self.show()
\ No newline at end of file
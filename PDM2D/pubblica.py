@@ -0,0 +1,30 @@
+"""Costruzione centrale dell'indice da eseguire periodicamente su una sola macchina.
+
+Scansiona le cartelle (quelle indicate o CARTELLE_DA_CERCARE) e pubblica snapshot
+e delta in INDICE_CONDIVISO_PERCORSO, da cui i client scaricano l'indice.
+"""
+
+import sys
+from backend import FileSearcher
+from config import CARTELLE_DA_CERCARE, INDEX_CONFIG
+from distribuzione import crea_indice_condiviso
+from index import crea_indice
+
+def main():
+    indice_condiviso = crea_indice_condiviso(INDEX_CONFIG)
+    if indice_condiviso is None:
+        print("INDICE_CONDIVISO_PERCORSO non configurato")
+        sys.exit(1)
+    
+    # L'indice locale della macchina di costruzione rende incrementali le scansioni successive
+    indice = crea_indice({**INDEX_CONFIG, 'enabled': True})
+    file_searcher = FileSearcher(sys.argv[1:] or CARTELLE_DA_CERCARE, indice, indice_condiviso=indice_condiviso)
+    try:
+        esito = file_searcher.pubblica_indice()
+    finally:
+        indice.chiudi()
+    print(f"Pubblicata la versione {esito.get('versione')} "
+          f"({'snapshot completo' if esito.get('completo') else 'delta'}, {esito.get('cartelle', 0)} cartelle)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Registro su file delle statistiche di ricerca, per individuare le cartelle lente.
+
+Ogni ricerca completata scrive una riga per cartella configurata con l'origine dei
+risultati (scansione, indice o servizio), le cartelle elencate, i file esaminati, i
+file trovati, la durata e la cartella più lenta. Il file viene ruotato oltre la
+dimensione configurata.
+"""
+
+import logging
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Optional
+
+def crea_registro(config: dict) -> Optional[logging.Logger]:
+    """Crea il registro descritto dalla configurazione, oppure None se disabilitato"""
+    if not config.get('path'):
+        return None
+
+    registro = logging.getLogger('pdm.ricerche')
+    registro.setLevel(logging.INFO)
+    # Il registro non deve finire anche nei log dell'applicazione che lo ospita
+    registro.propagate = False
+    if not registro.handlers:
+        try:
+            gestore = RotatingFileHandler(config['path'], maxBytes=int(config['max_mb'] * 1024 * 1024),
+                                          backupCount=config['backups'], encoding='utf-8')
+        except OSError:
+            # Percorso non scrivibile: la ricerca funziona comunque, senza registro
+            return None
+        gestore.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        registro.addHandler(gestore)
+    return registro
+
+def scrivi_statistiche(registro: logging.Logger, prefisso: str, statistiche: Dict[str, dict]) -> None:
+    """Scrive una riga per ogni cartella della ricerca"""
+    for radice, valori in statistiche.items():
+        registro.info(
+            "prefisso=%r radice=%r origine=%s cartelle=%d file=%d trovati=%d durata_ms=%.0f lenta=%r lenta_ms=%.0f "
+            "saltate=%d completa=%s",
+            prefisso, radice, valori['origine'], valori['cartelle'], valori['file'], valori['trovati'],
+            valori['durata'] * 1000, valori['cartella_lenta'] or '', valori['durata_lenta'] * 1000,
+            valori['saltate'], 'si' if valori['completa'] else 'no'
+        )
@@ -0,0 +1,232 @@
+"""Servizio di indicizzazione locale condiviso tra le applicazioni di ricerca.
+
+Avviato una volta per macchina, possiede la scansione delle cartelle e l'indice:
+PDM2D e PDM3D lo interrogano tramite un socket locale invece di scansionare
+ciascuno le stesse condivisioni. Non importa Qt, quindi può girare senza interfaccia.
+
+Protocollo: il client invia una riga JSON {"comando": "cerca", "radici": [...],
+"prefisso": "..."} e riceve una riga JSON per ogni radice indicizzata
+{"radice": ..., "risultati": [...]}, seguita da {"fine": true}. Ogni file è
+[percorso, dimensione, data di modifica]. Le radici non ancora indicizzate vengono
+accodate e il client le scansiona direttamente.
+
+Il comando "cerca_molti" riceve invece un elenco "prefissi" e per ogni radice
+risponde {"radice": ..., "trovati": {prefisso normalizzato: [...]}}.
+"""
+
+import json
+import queue
+import socket
+import socketserver
+import sys
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config import CARTELLE_DA_CERCARE, INDEX_CONFIG, SERVICE_CONFIG
+from index import Indice, crea_indice
+from voci import Voce, voce_da_percorso
+from watcher import crea_osservatori
+
+
+def _file_inviato(voce: Voce) -> list:
+    # Solo percorso e dati del file: PDM2D e PDM3D raggruppano i file con regole diverse
+    return [voce.percorso, voce.dimensione, voce.modificato]
+
+
+def _file_ricevuto(dato) -> Voce:
+    # Un servizio precedente invia il solo percorso: dimensione e data restano sconosciute
+    if isinstance(dato, str):
+        return voce_da_percorso(dato)
+    percorso, dimensione, modificato = dato
+    return voce_da_percorso(percorso, dimensione, modificato)
+
+
+class ServizioIndice:
+    """Indice condiviso: costruisce in background le radici richieste e le tiene aggiornate"""
+
+    def __init__(self, indice: Indice, aggiorna_minuti: float = 0, osserva: bool = False):
+        self.indice = indice
+        self.aggiorna_minuti = aggiorna_minuti
+        self.osserva = osserva
+        self.radici: List[str] = []
+        self.osservatori: list = []
+        self._in_coda: set = set()
+        self._coda: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._ferma = threading.Event()
+        threading.Thread(target=self._indicizza, daemon=True).start()
+        if aggiorna_minuti > 0:
+            threading.Thread(target=self._aggiorna_periodicamente, daemon=True).start()
+
+    def aggiungi_radici(self, radici: Iterable[str]) -> None:
+        """Accoda l'indicizzazione delle radici non ancora gestite dal servizio"""
+        with self._lock:
+            for radice in radici:
+                if radice not in self.radici:
+                    self.radici.append(radice)
+                    self._accoda(radice)
+
+    def _accoda(self, radice: str) -> None:
+        if radice not in self._in_coda:
+            self._in_coda.add(radice)
+            self._coda.put(radice)
+
+    def cerca(self, radici: List[str], prefisso: str) -> Dict[str, List[Voce]]:
+        """Restituisce i risultati delle sole radici già indicizzate; le altre vengono accodate"""
+        self.aggiungi_radici(radici)
+        return {
+            radice: self.indice.cerca_prefisso(radice, prefisso)
+            for radice in radici
+            if self.indice.contiene_radice(radice)
+        }
+
+    def cerca_molti(self, radici: List[str], prefissi: List[str]) -> Dict[str, Dict[str, List[Voce]]]:
+        """Come cerca, con più prefissi risolti in un solo passaggio sull'indice di ogni radice"""
+        self.aggiungi_radici(radici)
+        return {
+            radice: self.indice.cerca_prefissi(radice, prefissi)
+            for radice in radici
+            if self.indice.contiene_radice(radice)
+        }
+
+    def _indicizza(self) -> None:
+        while not self._ferma.is_set():
+            radice = self._coda.get()
+            if radice is None:
+                return
+            try:
+                statistiche = self.indice.aggiorna_radice(radice, annulla=self._ferma)
+                self.indice.salva()
+            except Exception:
+                statistiche = None
+            with self._lock:
+                self._in_coda.discard(radice)
+                if statistiche is not None and self.osserva and not any(o.radice == radice for o in self.osservatori):
+                    nuovi = crea_osservatori([radice], INDEX_CONFIG, self.indice.aggiorna_cartelle,
+                                             self.indice.aggiorna_radice)
+                    for osservatore in nuovi:
+                        osservatore.start()
+                    self.osservatori.extend(nuovi)
+
+    def _aggiorna_periodicamente(self) -> None:
+        while not self._ferma.wait(self.aggiorna_minuti * 60):
+            with self._lock:
+                for radice in self.radici:
+                    self._accoda(radice)
+
+    def ferma(self) -> None:
+        self._ferma.set()
+        self._coda.put(None)
+        for osservatore in self.osservatori:
+            osservatore.ferma()
+
+
+class _GestoreRichiesta(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        servizio: ServizioIndice = self.server.servizio
+        try:
+            richiesta = json.loads(self.rfile.readline().decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            return
+
+        if richiesta.get('comando') == 'cerca':
+            trovati = servizio.cerca(list(richiesta.get('radici') or []), richiesta.get('prefisso') or '')
+            for radice, risultati in trovati.items():
+                self._invia({"radice": radice, "risultati": [_file_inviato(voce) for voce in risultati]})
+        elif richiesta.get('comando') == 'cerca_molti':
+            trovati = servizio.cerca_molti(list(richiesta.get('radici') or []), list(richiesta.get('prefissi') or []))
+            for radice, per_prefisso in trovati.items():
+                self._invia({
+                    "radice": radice,
+                    "trovati": {
+                        prefisso: [_file_inviato(voce) for voce in voci] for prefisso, voci in per_prefisso.items()
+                    }
+                })
+        elif richiesta.get('comando') == 'stato':
+            self._invia({"radici": servizio.radici})
+        self._invia({"fine": True})
+
+    def _invia(self, messaggio: dict) -> None:
+        self.wfile.write(json.dumps(messaggio, ensure_ascii=False).encode('utf-8') + b'\n')
+
+
+class ServerServizio(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = sys.platform != 'win32'
+
+    def __init__(self, indirizzo: tuple, servizio: ServizioIndice):
+        super().__init__(indirizzo, _GestoreRichiesta)
+        self.servizio = servizio
+
+
+class ClientServizio:
+    """Interroga il servizio di indicizzazione; se non è in esecuzione le ricerche restano locali"""
+
+    def __init__(self, host: str, porta: int, timeout_secondi: float = 2):
+        self.host = host
+        self.porta = porta
+        self.timeout_secondi = timeout_secondi
+
+    def cerca(self, radici: List[str], prefisso: str) -> Optional[Dict[str, List[Voce]]]:
+        """Restituisce i risultati delle radici indicizzate dal servizio, oppure None se non raggiungibile"""
+        return self._richiedi(
+            {"comando": "cerca", "radici": radici, "prefisso": prefisso},
+            lambda messaggio: [_file_ricevuto(dato) for dato in messaggio['risultati']]
+        )
+
+    def cerca_molti(self, radici: List[str], prefissi: List[str]) -> Optional[Dict[str, Dict[str, List[Voce]]]]:
+        """Restituisce per ogni radice indicizzata i file di ogni prefisso, oppure None se non raggiungibile"""
+        return self._richiedi(
+            {"comando": "cerca_molti", "radici": radici, "prefissi": prefissi},
+            lambda messaggio: {
+                prefisso: [_file_ricevuto(dato) for dato in file] for prefisso, file in messaggio['trovati'].items()
+            }
+        )
+
+    def _richiedi(self, richiesta: dict, leggi: Callable[[dict], Any]) -> Optional[Dict[str, Any]]:
+        """Invia una richiesta e restituisce, per ogni radice della risposta, il messaggio letto con leggi"""
+        if not richiesta['radici']:
+            return {}
+        try:
+            with socket.create_connection((self.host, self.porta), timeout=self.timeout_secondi) as connessione:
+                connessione.sendall(json.dumps(richiesta, ensure_ascii=False).encode('utf-8') + b'\n')
+                trovati: Dict[str, Any] = {}
+                with connessione.makefile('rb') as risposta:
+                    for riga in risposta:
+                        messaggio = json.loads(riga.decode('utf-8'))
+                        if messaggio.get('fine'):
+                            return trovati
+                        trovati[messaggio['radice']] = leggi(messaggio)
+        except (OSError, ValueError, KeyError):
+            pass
+        # Risposta assente o interrotta: il chiamante scansiona tutte le radici da sé
+        return None
+
+
+def crea_client(config: dict) -> Optional[ClientServizio]:
+    """Crea il client del servizio descritto dalla configurazione, oppure None se disabilitato"""
+    if not config.get('enabled'):
+        return None
+    return ClientServizio(config['host'], config['port'], config['timeout_seconds'])
+
+
+def main() -> None:
+    # Il servizio ha sempre un indice, anche se le applicazioni lo hanno disabilitato
+    indice = crea_indice({**INDEX_CONFIG, 'enabled': True})
+    servizio = ServizioIndice(indice, INDEX_CONFIG['refresh_minutes'], INDEX_CONFIG['watch'])
+    servizio.aggiungi_radici(sys.argv[1:] or CARTELLE_DA_CERCARE)
+
+    with ServerServizio((SERVICE_CONFIG['host'], SERVICE_CONFIG['port']), servizio) as server:
+        print(f"Servizio di indicizzazione in ascolto su {SERVICE_CONFIG['host']}:{SERVICE_CONFIG['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servizio.ferma()
+            indice.chiudi()
+
+
+if __name__ == "__main__":
+    main()
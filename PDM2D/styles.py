@@ -45,7 +45,7 @@ def get_application_styles():
         border-color: #3498db;
     }
     
-    #searchButton {
+    #searchButton, #batchButton {
         font-size: 14px;
         font-weight: bold;
         background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
@@ -57,12 +57,12 @@ def get_application_styles():
         min-width: 120px;
     }
     
-    #searchButton:hover {
+    #searchButton:hover, #batchButton:hover {
         background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
                                   stop: 0 #5dade2, stop: 1 #3498db);
     }
     
-    #searchButton:pressed {
+    #searchButton:pressed, #batchButton:pressed {
         background: #2980b9;
     }
     
@@ -105,6 +105,11 @@ def get_application_styles():
         color: white;
     }
     
+    #historyCheck, #substringCheck, #newestCheck {
+        font-size: 12px;
+        color: #2c3e50;
+    }
+    
     #infoLabel {
         font-size: 12px;
         color: #7f8c8d;
@@ -112,6 +117,30 @@ def get_application_styles():
         font-style: italic;
     }
     
+    #statsButton {
+        font-size: 11px;
+        color: #2980b9;
+        background: transparent;
+        border: 1px solid #bdc3c7;
+        border-radius: 4px;
+        padding: 3px 10px;
+        margin-top: 10px;
+    }
+    
+    #statsButton:checked {
+        background: #e8f4fd;
+        border-color: #3498db;
+    }
+    
+    #statsPanel {
+        font-size: 11px;
+        color: #2c3e50;
+        background: #f4f6f7;
+        border: 1px solid #ecf0f1;
+        border-radius: 4px;
+        padding: 6px;
+    }
+    
     #footerFrame {
         background: rgba(255, 255, 255, 0.8);
         border-top: 1px solid #bdc3c7;
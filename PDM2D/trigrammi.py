@@ -0,0 +1,161 @@
+"""Indice dei trigrammi dei nomi file, per cercare una parte qualsiasi del nome.
+
+Ogni nome normalizzato viene scomposto nelle sue sottostringhe di tre caratteri e per
+ogni trigramma l'indice conserva l'elenco ordinato dei file che lo contengono. Una
+ricerca interseca gli elenchi dei trigrammi del testo cercato e verifica solo i
+candidati rimasti, senza scorrere tutti i nomi dell'archivio.
+
+L'indice vive in memoria accanto all'indice dei prefissi: viene costruito dal suo
+contenuto e poi aggiornato cartella per cartella con le stesse modifiche.
+"""
+
+import os
+import threading
+from array import array
+from typing import Dict, Iterable, List, Set
+
+from index import ContenutoCartella
+from voci import Voce, chiave_file, crea_voce, normalizza
+
+LUNGHEZZA = 3
+
+
+def trigrammi(testo: str) -> Set[str]:
+    return {testo[i:i + LUNGHEZZA] for i in range(len(testo) - LUNGHEZZA + 1)}
+
+
+class _RadiceTrigrammi:
+    """File di una radice con gli elenchi dei trigrammi.
+
+    I file rimossi restano negli elenchi come scartati, così gli elenchi non vanno mai
+    riscritti; quando gli scartati diventano la maggioranza la radice viene ricostruita.
+    """
+
+    def __init__(self):
+        self.cartelle: List[str] = []
+        self.id_per_percorso: Dict[str, int] = {}
+        self.file_per_cartella: Dict[int, List[int]] = {}
+        self.nomi: List[str] = []
+        self.normalizzati: List[str] = []
+        # Chiavi di raggruppamento, calcolate quando la cartella viene indicizzata e non a ogni ricerca
+        self.chiavi: List[str] = []
+        self.cartella_di = array('I')
+        self.dimensioni = array('q')
+        self.modificati = array('d')
+        self.elenchi: Dict[str, array] = {}
+        self.scartati: Set[int] = set()
+
+    def imposta_cartella(self, percorso: str, file: Iterable[str], dimensioni: Iterable[int],
+                         modificati: Iterable[float]) -> None:
+        self.rimuovi_cartella(percorso)
+        cartella_id = self.id_per_percorso.get(percorso)
+        if cartella_id is None:
+            cartella_id = len(self.cartelle)
+            self.cartelle.append(percorso)
+            self.id_per_percorso[percorso] = cartella_id
+
+        nuovi = []
+        for nome, dimensione, modificato in zip(file, dimensioni, modificati):
+            # Gli id crescono sempre: gli elenchi restano ordinati aggiungendo in coda
+            file_id = len(self.nomi)
+            normalizzato = normalizza(nome)
+            self.nomi.append(nome)
+            self.normalizzati.append(normalizzato)
+            self.chiavi.append(chiave_file(nome))
+            self.cartella_di.append(cartella_id)
+            self.dimensioni.append(dimensione)
+            self.modificati.append(modificato)
+            for trigramma in trigrammi(normalizzato):
+                elenco = self.elenchi.get(trigramma)
+                if elenco is None:
+                    elenco = self.elenchi[trigramma] = array('I')
+                elenco.append(file_id)
+            nuovi.append(file_id)
+        self.file_per_cartella[cartella_id] = nuovi
+
+    def rimuovi_cartella(self, percorso: str) -> None:
+        cartella_id = self.id_per_percorso.get(percorso)
+        if cartella_id is not None:
+            self.scartati.update(self.file_per_cartella.pop(cartella_id, ()))
+
+    def da_compattare(self) -> bool:
+        return len(self.scartati) > len(self.nomi) // 2
+
+    def compattata(self) -> "_RadiceTrigrammi":
+        nuova = _RadiceTrigrammi()
+        for cartella_id, file_ids in self.file_per_cartella.items():
+            nuova.imposta_cartella(self.cartelle[cartella_id], [self.nomi[i] for i in file_ids],
+                                   [self.dimensioni[i] for i in file_ids], [self.modificati[i] for i in file_ids])
+        return nuova
+
+    def cerca(self, testo: str) -> List[int]:
+        """Restituisce gli id dei file il cui nome normalizzato contiene il testo normalizzato"""
+        cercati = trigrammi(testo)
+        if cercati:
+            elenchi = []
+            for trigramma in cercati:
+                elenco = self.elenchi.get(trigramma)
+                if elenco is None:
+                    return []
+                elenchi.append(elenco)
+            # Dal più corto: l'insieme dei candidati si restringe subito
+            elenchi.sort(key=len)
+            candidati = set(elenchi[0])
+            for elenco in elenchi[1:]:
+                if not candidati:
+                    return []
+                candidati.intersection_update(elenco)
+        else:
+            # Testo più corto di un trigramma: si verificano tutti i nomi
+            candidati = range(len(self.nomi))
+
+        # I trigrammi non garantiscono la corrispondenza (ordine e ripetizioni): ogni candidato va verificato
+        return [
+            i for i in candidati
+            if i not in self.scartati and testo in self.normalizzati[i]
+        ]
+
+
+class IndiceTrigrammi:
+    """Indice dei trigrammi di più radici, aggiornato con le modifiche dell'indice dei prefissi"""
+
+    def __init__(self):
+        self._radici: Dict[str, _RadiceTrigrammi] = {}
+        self._lock = threading.Lock()
+
+    def contiene_radice(self, radice: str) -> bool:
+        return radice in self._radici
+
+    def costruisci_radice(self, radice: str, contenuto: Dict[str, ContenutoCartella]) -> None:
+        dati = _RadiceTrigrammi()
+        for percorso, (_, file, _, dimensioni, modificati) in contenuto.items():
+            dati.imposta_cartella(percorso, file, dimensioni, modificati)
+        with self._lock:
+            self._radici[radice] = dati
+
+    def applica_modifiche(self, radice: str, modificate: Dict[str, ContenutoCartella], rimosse: List[str]) -> None:
+        """Riporta le modifiche di una radice già costruita; le altre verranno costruite per intero"""
+        with self._lock:
+            dati = self._radici.get(radice)
+            if dati is None:
+                return
+            for percorso in rimosse:
+                dati.rimuovi_cartella(percorso)
+            for percorso, (_, file, _, dimensioni, modificati) in modificate.items():
+                dati.imposta_cartella(percorso, file, dimensioni, modificati)
+            if dati.da_compattare():
+                self._radici[radice] = dati.compattata()
+
+    def cerca(self, radice: str, testo: str) -> List[Voce]:
+        """Restituisce i file della radice che contengono il testo in un punto qualsiasi del nome"""
+        testo = normalizza(testo)
+        with self._lock:
+            dati = self._radici.get(radice)
+            if dati is None or not testo:
+                return []
+            trovati = sorted((dati.cartella_di[i], dati.nomi[i], i) for i in dati.cerca(testo))
+            return [
+                crea_voce(os.path.join(dati.cartelle[cartella_id], nome), dati.chiavi[i], dati.dimensioni[i],
+                          dati.modificati[i])
+                for cartella_id, nome, i in trovati
+            ]
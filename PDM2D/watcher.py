@@ -0,0 +1,224 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Set
+from crawler import RegoleEsclusione
+
+# Costanti inotify (linux/inotify.h)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+MASCHERA_INOTIFY = (
+    IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE | IN_ATTRIB
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+EVENTO = struct.Struct('iIII')
+
+# File system di rete: le modifiche fatte da altri client non generano eventi inotify
+FS_DI_RETE = {'cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', 'afs', 'fuse.sshfs', '9p'}
+
+
+def _tipo_file_system(percorso: str) -> str:
+    """Restituisce il tipo di file system su cui si trova il percorso (solo Linux)"""
+    percorso = os.path.realpath(percorso)
+    migliore, tipo = '', ''
+    try:
+        with open('/proc/mounts', encoding='utf-8') as mounts:
+            for riga in mounts:
+                campi = riga.split()
+                if len(campi) < 3:
+                    continue
+                punto = campi[1].replace('\\040', ' ')
+                if (percorso == punto or percorso.startswith(punto.rstrip('/') + '/')) and len(punto) > len(migliore):
+                    migliore, tipo = punto, campi[2]
+    except OSError:
+        pass
+    return tipo
+
+
+def inotify_disponibile(radice: str) -> bool:
+    """Indica se la radice può essere osservata con inotify"""
+    return sys.platform.startswith('linux') and _tipo_file_system(radice) not in FS_DI_RETE
+
+
+class Osservatore(threading.Thread):
+    """Thread che segnala le modifiche sotto una radice finché non viene fermato"""
+
+    def __init__(self, radice: str):
+        super().__init__(daemon=True)
+        self.radice = radice
+        self._ferma = threading.Event()
+
+    def ferma(self) -> None:
+        self._ferma.set()
+
+
+class OsservatorePolling(Osservatore):
+    """Controlla periodicamente la radice con l'aggiornamento incrementale basato sugli mtime.
+
+    È il ripiego per le condivisioni di rete e i sistemi senza inotify.
+    """
+
+    def __init__(self, radice: str, intervallo_secondi: float, aggiorna_radice: Callable[[str], None]):
+        super().__init__(radice)
+        self.intervallo_secondi = max(1.0, intervallo_secondi)
+        self._aggiorna_radice = aggiorna_radice
+
+    def run(self) -> None:
+        while not self._ferma.wait(self.intervallo_secondi):
+            try:
+                self._aggiorna_radice(self.radice)
+            except Exception:
+                # Un errore transitorio della condivisione non deve fermare l'osservazione
+                pass
+
+
+class OsservatoreInotify(Osservatore):
+    """Riceve da inotify le modifiche alle cartelle della radice e le raggruppa.
+
+    Gli eventi vengono accumulati come insieme di cartelle modificate e consegnati
+    in un unico blocco dopo una pausa di raggruppa_secondi (al massimo ogni dieci
+    pause): una copia di migliaia di file produce pochi aggiornamenti dell'indice.
+    """
+
+    def __init__(self, radice: str, raggruppa_secondi: float,
+                 aggiorna_cartelle: Callable[[str, Set[str]], None],
+                 aggiorna_radice: Callable[[str], None], esclusioni: Optional[RegoleEsclusione] = None):
+        super().__init__(radice)
+        self.raggruppa_secondi = raggruppa_secondi
+        self.esclusioni = esclusioni or RegoleEsclusione()
+        self._aggiorna_cartelle = aggiorna_cartelle
+        self._aggiorna_radice = aggiorna_radice
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self._cartelle: Dict[int, str] = {}
+        try:
+            self._osserva_albero(radice)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _osserva(self, cartella: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(cartella), MASCHERA_INOTIFY)
+        if wd < 0:
+            errore = ctypes.get_errno()
+            raise OSError(errore, os.strerror(errore), cartella)
+        self._cartelle[wd] = cartella
+
+    def _osserva_albero(self, cartella: str) -> None:
+        if self.esclusioni.contiene(self.radice, cartella):
+            return
+        for root, dirs, _ in os.walk(cartella):
+            self._osserva(root)
+            # Come nell'indice, i sottoalberi esclusi non vengono visitati né osservati
+            ammesse = self.esclusioni.filtra(self.radice, [os.path.join(root, nome) for nome in dirs])
+            dirs[:] = [os.path.basename(cartella) for cartella in ammesse]
+
+    def _leggi_eventi(self, sporche: Set[str]) -> bool:
+        """Legge gli eventi disponibili; restituisce True se la coda del kernel è traboccata"""
+        try:
+            dati = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+
+        traboccata = False
+        posizione = 0
+        while posizione < len(dati):
+            wd, maschera, _, lunghezza = EVENTO.unpack_from(dati, posizione)
+            nome = dati[posizione + EVENTO.size:posizione + EVENTO.size + lunghezza].rstrip(b'\0')
+            posizione += EVENTO.size + lunghezza
+
+            if maschera & IN_Q_OVERFLOW:
+                traboccata = True
+                continue
+            cartella = self._cartelle.get(wd)
+            if cartella is None:
+                continue
+            if maschera & IN_IGNORED:
+                del self._cartelle[wd]
+                continue
+
+            if maschera & (IN_DELETE_SELF | IN_MOVE_SELF):
+                sporche.add(os.path.dirname(cartella) if cartella != self.radice else cartella)
+            else:
+                sporche.add(cartella)
+            if maschera & IN_ISDIR and maschera & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self._osserva_albero(os.path.join(cartella, os.fsdecode(nome)))
+                except OSError:
+                    traboccata = True
+        return traboccata
+
+    def run(self) -> None:
+        sporche: Set[str] = set()
+        primo_evento = ultimo_evento = 0.0
+        try:
+            while not self._ferma.is_set():
+                pronti, _, _ = select.select([self._fd], [], [], min(self.raggruppa_secondi, 0.5))
+                adesso = time.monotonic()
+                if pronti:
+                    if not sporche:
+                        primo_evento = adesso
+                    if self._leggi_eventi(sporche):
+                        # Eventi persi: si ricorre al confronto degli mtime su tutta la radice
+                        sporche.clear()
+                        try:
+                            self._aggiorna_radice(self.radice)
+                        except Exception:
+                            # Come per i blocchi di cartelle, un errore non deve fermare l'osservazione
+                            pass
+                        continue
+                    ultimo_evento = adesso
+
+                in_pausa = adesso - ultimo_evento >= self.raggruppa_secondi
+                troppo_attesa = adesso - primo_evento >= self.raggruppa_secondi * 10
+                if sporche and (in_pausa or troppo_attesa):
+                    blocco, sporche = sporche, set()
+                    try:
+                        self._aggiorna_cartelle(self.radice, blocco)
+                    except Exception:
+                        pass
+        finally:
+            os.close(self._fd)
+
+
+def crea_osservatori(radici: Iterable[str], config: dict,
+                     aggiorna_cartelle: Callable[[str, Set[str]], None],
+                     aggiorna_radice: Callable[[str], None]) -> list:
+    """Crea un osservatore per ogni radice: inotify dove possibile, altrimenti polling"""
+    osservatori = []
+    esclusioni = RegoleEsclusione(config.get('exclude') or [])
+    for radice in radici:
+        if not os.path.isdir(radice):
+            continue
+        osservatore = None
+        if inotify_disponibile(radice):
+            try:
+                osservatore = OsservatoreInotify(radice, config['watch_batch_ms'] / 1000,
+                                                 aggiorna_cartelle, aggiorna_radice, esclusioni)
+            except OSError:
+                # Es. limite max_user_watches raggiunto: si ripiega sul polling
+                osservatore = None
+        if osservatore is None:
+            osservatore = OsservatorePolling(radice, config['watch_poll_seconds'], aggiorna_radice)
+        osservatori.append(osservatore)
+    return osservatori
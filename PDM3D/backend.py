@@ -1,38 +1,464 @@
 import os
-from typing import List, Dict, Union, Optional
-from config import ERROR_MESSAGES
+import re
+import threading
+from typing import Iterable, Iterator, List, Dict, Union, Optional
+import time
+from config import CARTELLE_ESCLUSE, ERROR_MESSAGES, GROUPING_CONFIG, INDEX_CONFIG, LOG_CONFIG, SEARCH_CONFIG
+from cache import CacheRicerche
+from crawler import Crawler, RegoleEsclusione, SondaCartelle, ordina_blocchi
+from distribuzione import IndiceCondiviso
+from index import Indice
+from registro import crea_registro, scrivi_statistiche
+from sommari import SommariCartelle
+from servizio import ClientServizio
+from trigrammi import IndiceTrigrammi
+from voci import InsiemePrefissi, Voce, normalizza, raggruppa, ultime_versioni
+from watcher import crea_osservatori
 
 class FileSearcher:
     
-    def __init__(self, cartelle_da_cercare: Optional[List[str]] = None):
+    def __init__(self, cartelle_da_cercare: Optional[List[str]] = None, indice: Optional[Indice] = None,
+                 servizio: Optional[ClientServizio] = None, indice_condiviso: Optional[IndiceCondiviso] = None):
         self.cartelle_da_cercare: List[str] = cartelle_da_cercare or []
+        self.indice = indice
+        self.servizio = servizio
+        self.indice_condiviso = indice_condiviso
+        self.osservatori: list = []
+        # Con le versioni nascoste restituisce solo l'ultima versione di ogni modello (RISULTATI_SOLO_ULTIMA_VERSIONE)
+        self.mostra_storico = GROUPING_CONFIG['show_history']
+        # Riassunti dei sottoalberi imparati dalle scansioni, per saltare quelli senza il prefisso (RICERCA_RIASSUNTI)
+        sommari = None
+        if SEARCH_CONFIG['summaries']:
+            sommari = SommariCartelle(SEARCH_CONFIG['summaries_verify_seconds'])
+            # Un sottoalbero saltato che conteneva il prefisso rende incompleti i risultati in cache
+            sommari.ascoltatori.append(lambda radice: self.invalida_cache())
+        esclusioni = RegoleEsclusione(CARTELLE_ESCLUSE)
+        # Le regole di esclusione non valide sono ignorate e riportate in testa agli avvisi di ogni ricerca
+        self.avvisi_configurazione: List[str] = esclusioni.errori
+        self.crawler = Crawler(
+            SEARCH_CONFIG['max_threads'],
+            SEARCH_CONFIG['root_timeout_seconds'],
+            SondaCartelle(SEARCH_CONFIG['probe_timeout_seconds'], SEARCH_CONFIG['probe_cache_seconds']),
+            esclusioni,
+            sommari
+        )
+        self.cache = CacheRicerche(
+            SEARCH_CONFIG['cache_entries'],
+            SEARCH_CONFIG['cache_mb'] * 1024 * 1024,
+            SEARCH_CONFIG['cache_ttl_seconds'],
+            self.filtra_risultati
+        )
+        # Anche nella ricerca per parte del nome un testo più lungo restringe i risultati di uno più corto
+        self.cache_contiene = CacheRicerche(
+            SEARCH_CONFIG['cache_entries'],
+            SEARCH_CONFIG['cache_mb'] * 1024 * 1024,
+            SEARCH_CONFIG['cache_ttl_seconds'],
+            lambda risultati, testo: self.filtra_risultati(risultati, testo, contiene=True)
+        )
+        # Indice dei trigrammi per la ricerca per parte del nome, tenuto allineato all'indice dei prefissi
+        self.trigrammi: Optional[IndiceTrigrammi] = None
+        if indice is not None and INDEX_CONFIG['trigrams']:
+            self.trigrammi = IndiceTrigrammi()
+            indice.ascoltatori.append(self.trigrammi.applica_modifiche)
+        # Registro su file delle statistiche di ogni ricerca (REGISTRO_PERCORSO), None se disabilitato
+        self.registro = crea_registro(LOG_CONFIG)
     
 
-    def cerca_file(self, prefisso: str) -> Dict[str, Union[str, List[str]]]:
-        if not prefisso or not prefisso.strip():
+    @staticmethod
+    def corrisponde(nome_file: str, prefisso: str, contiene: bool = False) -> bool:
+        """Criterio di corrispondenza tra nome file e prefisso usato da tutte le ricerche.
+        
+        Il confronto avviene tra nomi normalizzati (maiuscole e separatori ignorati, se abilitato);
+        con contiene il testo può trovarsi in un punto qualsiasi del nome.
+        """
+        if contiene:
+            return normalizza(prefisso) in normalizza(nome_file)
+        return normalizza(nome_file).startswith(normalizza(prefisso))
+    
+    @staticmethod
+    def is_avviso(voce: Union[Voce, str]) -> bool:
+        """Indica se una voce dei risultati è un messaggio di avviso e non un file"""
+        return isinstance(voce, str)
+    
+    def filtra_risultati(self, risultati: List[Union[Voce, str]], prefisso: str,
+                         contiene: bool = False) -> List[Union[Voce, str]]:
+        """Restringe dei risultati già trovati a un prefisso più lungo, mantenendo gli avvisi"""
+        prefisso = normalizza(prefisso)
+        return [
+            voce for voce in risultati
+            if self.is_avviso(voce) or self.corrisponde(os.path.basename(voce.percorso), prefisso, contiene)
+        ]
+    
+    def comprimi_versioni(self, risultati: List[Union[Voce, str]]) -> List[Union[Voce, str]]:
+        """Toglie le versioni precedenti dai risultati, se configurato e se lo storico non è richiesto"""
+        if self.mostra_storico or not GROUPING_CONFIG['collapse']:
+            return risultati
+        return ultime_versioni(risultati)
+    
+    def _cache(self, contiene: bool) -> CacheRicerche:
+        return self.cache_contiene if contiene else self.cache
+    
+    @staticmethod
+    def statistiche_indicizzata(origine: str, trovati: int, durata: float) -> dict:
+        """Statistiche di una cartella risolta dall'indice o dal servizio, senza scansione"""
+        return {
+            "origine": origine,
+            "cartelle": 0,
+            "file": 0,
+            "trovati": trovati,
+            "durata": round(durata, 4),
+            "cartella_lenta": None,
+            "durata_lenta": 0.0,
+            "saltate": 0,
+            "completa": True
+        }
+    
+    def _in_ordine(self, statistiche: Dict[str, dict]) -> Dict[str, dict]:
+        """Statistiche nell'ordine delle cartelle configurate, come i risultati"""
+        return {cartella: statistiche[cartella] for cartella in self.cartelle_da_cercare if cartella in statistiche}
+    
+    @staticmethod
+    def _completa(annulla: Optional[threading.Event], statistiche: Dict[str, dict]) -> bool:
+        """Indica se la ricerca è arrivata fino in fondo in ogni cartella e può finire in cache"""
+        if annulla is not None and annulla.is_set():
+            return False
+        # Una cartella scaduta o irraggiungibile potrebbe rispondere alla prossima ricerca
+        return all(valori["completa"] for valori in statistiche.values())
+    
+    def _registra(self, prefisso: str, statistiche: Dict[str, dict],
+                  annulla: Optional[threading.Event] = None) -> None:
+        """Scrive nel registro le statistiche di una ricerca arrivata fino in fondo"""
+        if self.registro is not None and statistiche and (annulla is None or not annulla.is_set()):
+            scrivi_statistiche(self.registro, prefisso, statistiche)
+    
+    def cerca_file(self, prefisso: str, annulla: Optional[threading.Event] = None,
+                   contiene: bool = False) -> Dict[str, Union[str, list, dict]]:
+        """Restituisce i file trovati e gli stessi file raggruppati per disegno.
+        
+        In "gruppi" ogni disegno compare una volta, con la revisione più recente per prima
+        e i suoi allegati (es. PDF); gli avvisi restano al loro posto. Con contiene il
+        testo cercato può trovarsi in un punto qualsiasi del nome. In "statistiche" ci sono
+        i tempi e i contatori di ogni cartella (vuoto se i risultati vengono dalla cache).
+        Ogni file è una Voce con dimensione e data di modifica lette insieme all'elenco della
+        cartella: per ordinarli per data (piu_recenti) non serve accedere di nuovo ai file.
+        """
+        if not prefisso or not normalizza(prefisso.strip()):
             return {"errore": ERROR_MESSAGES['empty_prefix']}
         
-        risultati: List[str] = []
         prefisso_pulito = prefisso.strip()
+        # Le grafie equivalenti dello stesso prefisso condividono la voce in cache
+        chiave_cache = normalizza(prefisso_pulito)
+        risultati = self._cache(contiene).leggi(chiave_cache)
+        if risultati is not None:
+            risultati = self.avvisi_configurazione + self.comprimi_versioni(risultati)
+            return {"risultati": risultati, "gruppi": raggruppa(risultati), "statistiche": {}}
+        
+        risultati = []
+        statistiche: Dict[str, dict] = {}
+        trovati = self._cerca_indicizzate(prefisso_pulito, contiene, statistiche)
+        da_scansionare = [c for c in self.cartelle_da_cercare if c not in trovati]
+        trovati.update(self.crawler.cerca(da_scansionare, prefisso_pulito, annulla, contiene, statistiche))
         
         for cartella in self.cartelle_da_cercare:
-            risultati.extend(self._cerca_in_cartella(cartella, prefisso_pulito))
+            risultati.extend(trovati[cartella])
         
-        return {"risultati": risultati}
+        if self._completa(annulla, statistiche):
+            self._cache(contiene).scrivi(chiave_cache, risultati)
+        self._registra(prefisso_pulito, statistiche, annulla)
+        # La cache conserva tutte le versioni: mostrare lo storico non richiede una nuova ricerca
+        risultati = self.avvisi_configurazione + self.comprimi_versioni(risultati)
+        return {"risultati": risultati, "gruppi": raggruppa(risultati), "statistiche": self._in_ordine(statistiche)}
     
-    def _cerca_in_cartella(self, cartella: str, prefisso: str) -> List[str]:
-        if not os.path.exists(cartella):
-            return [ERROR_MESSAGES['folder_not_exists'].format(folder=cartella)]
+    def cerca_file_iter(self, prefisso: str, annulla: Optional[threading.Event] = None,
+                        contiene: bool = False, statistiche: Optional[Dict[str, dict]] = None,
+                        ordinati: Optional[List[Union[Voce, str]]] = None) -> Iterator[Union[Voce, str]]:
+        """Restituisce i risultati man mano che vengono trovati, prima quelli dell'indice.
         
-        try:
-            risultati = []
-            for root, _, files in os.walk(cartella):
-                risultati.extend(os.path.join(root, file) for file in files if file.startswith(prefisso))
-            return risultati
-        except PermissionError:
-            return [ERROR_MESSAGES['permission_denied'].format(folder=cartella)]
-        except Exception as e:
-            return [ERROR_MESSAGES['folder_access_error'].format(folder=cartella, error=str(e))]
+        Impostando annulla la scansione si interrompe entro la cartella in corso di lettura.
+        Il dizionario statistiche, se passato, al termine contiene i contatori di ogni cartella;
+        la lista ordinati, se passata, al termine contiene gli stessi risultati nell'ordine di
+        cerca_file (cartelle nell'ordine configurato, poi sottoalbero e cartella).
+        """
+        if statistiche is None:
+            statistiche = {}
+        if ordinati is None:
+            ordinati = []
+        prefisso_pulito = prefisso.strip() if prefisso else ""
+        chiave_cache = normalizza(prefisso_pulito)
+        if not chiave_cache:
+            raise ValueError(ERROR_MESSAGES['empty_prefix'])
+        
+        yield from self.avvisi_configurazione
+        in_cache = self._cache(contiene).leggi(chiave_cache)
+        if in_cache is not None:
+            in_cache = self.comprimi_versioni(in_cache)
+            ordinati[:] = self.avvisi_configurazione + in_cache
+            yield from in_cache
+            return
+        
+        indicizzate = self._cerca_indicizzate(prefisso_pulito, contiene, statistiche)
+        da_scansionare = []
+        for cartella in self.cartelle_da_cercare:
+            if cartella in indicizzate:
+                yield from self.comprimi_versioni(indicizzate[cartella])
+            else:
+                da_scansionare.append(cartella)
+        
+        blocchi: Dict[str, list] = {cartella: [] for cartella in da_scansionare}
+        for cartella, ordine, trovati in self.crawler.cerca_iter(da_scansionare, prefisso_pulito, annulla, contiene,
+                                                                 statistiche):
+            blocchi[cartella].append((ordine, trovati))
+            yield from self.comprimi_versioni(trovati)
+        
+        # I file arrivano nell'ordine di completamento: la cache riceve l'ordine di cerca_file,
+        # così la stessa ricerca dà lo stesso elenco dalla cache e da una nuova scansione
+        risultati: List[Union[Voce, str]] = []
+        for cartella in self.cartelle_da_cercare:
+            risultati.extend(indicizzate[cartella] if cartella in indicizzate else ordina_blocchi(blocchi[cartella]))
+        ordinati[:] = self.avvisi_configurazione + self.comprimi_versioni(risultati)
+        
+        # Solo una ricerca arrivata fino in fondo finisce in cache
+        if self._completa(annulla, statistiche):
+            self._cache(contiene).scrivi(chiave_cache, risultati)
+        self._registra(prefisso_pulito, statistiche, annulla)
+    
+    @staticmethod
+    def leggi_elenco(testo: str) -> List[str]:
+        """Estrae i codici da un elenco incollato, uno per riga.
+        
+        Di ogni riga conta solo la prima colonna: celle copiate da un foglio di calcolo
+        o valori separati da punto e virgola.
+        """
+        codici = []
+        for riga in testo.splitlines():
+            codice = re.split(r'[\t;]', riga, maxsplit=1)[0].strip()
+            if codice:
+                codici.append(codice)
+        return codici
+    
+    def cerca_molti(self, prefissi: Iterable[str],
+                    annulla: Optional[threading.Event] = None) -> Dict[str, Union[str, list, dict]]:
+        """Cerca insieme un elenco di prefissi, ad esempio i codici di una distinta base.
+        
+        Tutti i prefissi vengono risolti in un solo passaggio: una ricerca ordinata
+        sull'indice di ogni radice e una sola scansione delle cartelle non indicizzate,
+        qualunque sia il numero dei codici. Restituisce i file trovati per ogni prefisso
+        (nell'ordine ricevuto), i prefissi senza risultati, gli avvisi della scansione e le
+        statistiche di ogni cartella.
+        """
+        elenco = list(dict.fromkeys(p.strip() for p in prefissi if p and normalizza(p.strip())))
+        if not elenco:
+            return {"errore": ERROR_MESSAGES['empty_prefix']}
+        
+        per_chiave: Dict[str, List[Union[Voce, str]]] = {}
+        da_cercare = []
+        for chiave in InsiemePrefissi(elenco).prefissi:
+            risultati = self.cache.leggi(chiave)
+            if risultati is None:
+                da_cercare.append(chiave)
+            else:
+                per_chiave[chiave] = risultati
+        statistiche: Dict[str, dict] = {}
+        if da_cercare:
+            per_chiave.update(self._cerca_molti(da_cercare, annulla, statistiche))
+            self._registra(f"elenco di {len(da_cercare)} codici", statistiche, annulla)
+        
+        trovati = {}
+        avvisi = list(self.avvisi_configurazione)
+        for prefisso in elenco:
+            risultati = per_chiave[normalizza(prefisso)]
+            avvisi.extend(voce for voce in risultati if self.is_avviso(voce) and voce not in avvisi)
+            trovati[prefisso] = self.comprimi_versioni([voce for voce in risultati if not self.is_avviso(voce)])
+        return {
+            "risultati": trovati,
+            "mancanti": [prefisso for prefisso, voci in trovati.items() if not voci],
+            "avvisi": avvisi,
+            "statistiche": self._in_ordine(statistiche)
+        }
+    
+    def _cerca_molti(self, chiavi: List[str], annulla: Optional[threading.Event] = None,
+                     statistiche: Optional[Dict[str, dict]] = None) -> Dict[str, List[Union[Voce, str]]]:
+        """Risultati di ogni prefisso normalizzato, con indice, servizio e scansione delle cartelle rimanenti"""
+        if statistiche is None:
+            statistiche = {}
+        per_radice: Dict[str, Dict[str, List[Union[Voce, str]]]] = {}
+        for cartella in self.cartelle_da_cercare:
+            if self.indice is not None and self.indice.contiene_radice(cartella):
+                inizio = time.monotonic()
+                per_radice[cartella] = self.indice.cerca_prefissi(cartella, chiavi)
+                statistiche[cartella] = self.statistiche_indicizzata(
+                    "indice", sum(map(len, per_radice[cartella].values())), time.monotonic() - inizio
+                )
+        if self.servizio is not None:
+            rimanenti = [c for c in self.cartelle_da_cercare if c not in per_radice]
+            inizio = time.monotonic()
+            servite = self.servizio.cerca_molti(rimanenti, chiavi) or {}
+            durata = time.monotonic() - inizio
+            for cartella, per_prefisso in servite.items():
+                statistiche[cartella] = self.statistiche_indicizzata(
+                    "servizio", sum(map(len, per_prefisso.values())), durata
+                )
+            per_radice.update(servite)
+        
+        # Le cartelle rimaste vengono scansionate una volta sola per tutti i prefissi
+        insieme = InsiemePrefissi(chiavi)
+        da_scansionare = [c for c in self.cartelle_da_cercare if c not in per_radice]
+        for cartella, risultati in self.crawler.cerca_molti(da_scansionare, insieme, annulla, statistiche).items():
+            per_prefisso = per_radice[cartella] = {chiave: [] for chiave in chiavi}
+            for voce in risultati:
+                if self.is_avviso(voce):
+                    # Un avviso riguarda la cartella, quindi tutti i prefissi
+                    destinazioni = chiavi
+                else:
+                    destinazioni = insieme.trova(normalizza(os.path.basename(voce.percorso)))
+                for chiave in destinazioni:
+                    per_prefisso[chiave].append(voce)
+        
+        per_chiave = {
+            chiave: [voce for cartella in self.cartelle_da_cercare for voce in per_radice[cartella].get(chiave, [])]
+            for chiave in chiavi
+        }
+        # Ogni prefisso finisce in cache come se fosse stato cercato da solo
+        if self._completa(annulla, statistiche):
+            for chiave, risultati in per_chiave.items():
+                self.cache.scrivi(chiave, risultati)
+        return per_chiave
+    
+    def _scansiona_indice(self, cartelle: List[str], totali: Dict[str, int],
+                          annulla: Optional[threading.Event] = None) -> bool:
+        """Aggiorna l'indice scansionando le cartelle; restituisce False se annullato"""
+        for cartella in cartelle:
+            if annulla is not None and annulla.is_set():
+                return False
+            statistiche = self.indice.aggiorna_radice(cartella, annulla=annulla)
+            for chiave, valore in (statistiche or {}).items():
+                totali[chiave] += valore
+        return True
+    
+    def pubblica_indice(self, annulla: Optional[threading.Event] = None) -> Dict[str, int]:
+        """Modalità di costruzione: scansiona le cartelle e pubblica l'indice nella cartella condivisa"""
+        totali = {"controllate": 0, "riscansionate": 0, "saltate": 0}
+        if self.indice is None or self.indice_condiviso is None:
+            return totali
+        if self._scansiona_indice(self.cartelle_da_cercare, totali, annulla):
+            self.indice.salva()
+            totali.update(self.indice_condiviso.pubblica(self.indice, self.cartelle_da_cercare))
+        return totali
+    
+    def _cerca_indicizzate(self, prefisso: str, contiene: bool = False,
+                           statistiche: Optional[Dict[str, dict]] = None) -> Dict[str, List[Voce]]:
+        """Cerca nelle cartelle indicizzate localmente o dal servizio condiviso.
+        
+        Le cartelle assenti dal risultato vanno scansionate direttamente.
+        """
+        if statistiche is None:
+            statistiche = {}
+        trovati = {}
+        if contiene:
+            # Per parte del nome servono i trigrammi, che esistono solo nell'indice locale
+            for cartella in self.cartelle_da_cercare:
+                if self.trigrammi is not None and self.trigrammi.contiene_radice(cartella) \
+                        and self.indice.contiene_radice(cartella):
+                    inizio = time.monotonic()
+                    trovati[cartella] = self.trigrammi.cerca(cartella, prefisso)
+                    statistiche[cartella] = self.statistiche_indicizzata(
+                        "indice", len(trovati[cartella]), time.monotonic() - inizio
+                    )
+            return trovati
+        
+        for cartella in self.cartelle_da_cercare:
+            if self.indice is not None and self.indice.contiene_radice(cartella):
+                inizio = time.monotonic()
+                trovati[cartella] = self.indice.cerca_prefisso(cartella, prefisso)
+                statistiche[cartella] = self.statistiche_indicizzata(
+                    "indice", len(trovati[cartella]), time.monotonic() - inizio
+                )
+        
+        if self.servizio is not None:
+            rimanenti = [c for c in self.cartelle_da_cercare if c not in trovati]
+            inizio = time.monotonic()
+            servite = self.servizio.cerca(rimanenti, prefisso) or {}
+            durata = time.monotonic() - inizio
+            # Una sola richiesta per tutte le cartelle: ognuna riporta la durata complessiva
+            for cartella, voci in servite.items():
+                statistiche[cartella] = self.statistiche_indicizzata("servizio", len(voci), durata)
+            trovati.update(servite)
+        return trovati
+    
+    def aggiorna_indice(self, annulla: Optional[threading.Event] = None) -> Dict[str, int]:
+        """Aggiorna l'indice delle cartelle configurate, riscansionando solo le cartelle modificate.
+        
+        Le cartelle servite da un indice condiviso aggiornato vengono scaricate invece che scansionate.
+        """
+        totali = {"controllate": 0, "riscansionate": 0, "saltate": 0}
+        if self.indice is None:
+            return totali
+        
+        servite = {}
+        if self.indice_condiviso is not None:
+            servite = self.indice_condiviso.sincronizza(self.indice, self.cartelle_da_cercare)
+            totali["riscansionate"] += sum(servite.values())
+        
+        da_scansionare = [c for c in self.cartelle_da_cercare if c not in servite]
+        if not self._scansiona_indice(da_scansionare, totali, annulla):
+            return totali
+        self.indice.salva()
+        self._costruisci_trigrammi(annulla)
+        
+        # Una cartella modificata rende obsoleti i risultati in cache
+        if totali["riscansionate"]:
+            self.invalida_cache()
+        return totali
+    
+    def _costruisci_trigrammi(self, annulla: Optional[threading.Event] = None) -> None:
+        """Costruisce i trigrammi delle radici indicizzate che non li hanno ancora.
+        
+        Le modifiche successive arrivano dall'indice dei prefissi, cartella per cartella.
+        """
+        if self.trigrammi is None:
+            return
+        for cartella in self.cartelle_da_cercare:
+            if annulla is not None and annulla.is_set():
+                return
+            if self.indice.contiene_radice(cartella) and not self.trigrammi.contiene_radice(cartella):
+                self.trigrammi.costruisci_radice(cartella, self.indice.contenuto_radice(cartella))
+    
+    def avvia_osservatori(self) -> None:
+        """Mantiene aggiornato l'indice osservando le modifiche alle cartelle configurate"""
+        self.ferma_osservatori()
+        if self.indice is None:
+            return
+        self.osservatori = crea_osservatori(
+            self.cartelle_da_cercare, INDEX_CONFIG, self._aggiorna_cartelle_osservate, self._aggiorna_radice_osservata
+        )
+        for osservatore in self.osservatori:
+            osservatore.start()
+    
+    def ferma_osservatori(self) -> None:
+        for osservatore in self.osservatori:
+            osservatore.ferma()
+        for osservatore in self.osservatori:
+            osservatore.join(timeout=2)
+        self.osservatori = []
+    
+    def _aggiorna_cartelle_osservate(self, radice: str, cartelle) -> None:
+        statistiche = self.indice.aggiorna_cartelle(radice, cartelle)
+        if statistiche["controllate"]:
+            self.invalida_cache()
+    
+    def _aggiorna_radice_osservata(self, radice: str) -> None:
+        statistiche = self.indice.aggiorna_radice(radice)
+        if statistiche and statistiche["riscansionate"]:
+            self.invalida_cache()
+    
+    def invalida_cache(self) -> None:
+        self.cache.invalida()
+        self.cache_contiene.invalida()
+    
+    def statistiche_cache(self) -> Dict[str, int]:
+        """Restituisce hit, miss, numero di voci e dimensione delle cache delle ricerche"""
+        prefissi, contiene = self.cache.statistiche(), self.cache_contiene.statistiche()
+        return {chiave: valore + contiene[chiave] for chiave, valore in prefissi.items()}
     
     def apri_file(self, percorso: str) -> Dict[str, Union[bool, str]]:
         if not percorso:
@@ -55,4 +481,7 @@ class FileSearcher:
         return self.cartelle_da_cercare.copy()
     
     def set_cartelle(self, cartelle: Optional[List[str]]) -> None:
-        self.cartelle_da_cercare = cartelle.copy() if cartelle else []
\ No newline at end of file
+        self.cartelle_da_cercare = cartelle.copy() if cartelle else []
+        self.invalida_cache()
+        if self.osservatori:
+            self.avvia_osservatori()
\ No newline at end of file
@@ -0,0 +1,278 @@
+"""Misura dei tempi di ricerca su un archivio di disegni sintetico.
+
+Genera (o riusa) un archivio di prova con un numero configurabile di file, profondità
+e ramificazione delle cartelle e nomi come quelli reali (37202.60010.mi, _vN.mi, .pdf,
+.prt.N), poi cronometra scansione a freddo, costruzione e aggiornamento dell'indice,
+ricerche per prefisso, per parte del nome e per elenco. Con --latenza-ms ogni elenco
+di cartella e ogni stat attende il tempo indicato, per simulare una condivisione di rete.
+
+I risultati vengono scritti in un file JSON, da confrontare tra due versioni:
+
+    python benchmark.py --file 200000 --uscita prima.json
+    python benchmark.py --file 200000 --uscita dopo.json
+    python benchmark.py --confronta prima.json dopo.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from backend import FileSearcher
+from config import APP_NAME, APP_VERSION, INDEX_CONFIG, SEARCH_CONFIG
+from index import IndiceMemoria, IndiceSnapshot, IndiceSQLite
+
+# Incrementare quando cambia il formato del file dei risultati
+VERSIONE_RISULTATI = 1
+MANIFESTO_ARCHIVIO = 'benchmark.json'
+
+def _codice(generatore: random.Random) -> str:
+    return f"{generatore.randint(10000, 99999)}.{generatore.randint(10000, 99999)}"
+
+def _nomi_disegno(generatore: random.Random, codice: str) -> List[str]:
+    """File di un disegno: revisioni 2D con il PDF dell'ultima, oppure versioni Creo di parte e tavola"""
+    if generatore.random() < 0.1:
+        # Una parte dell'archivio usa altri separatori: la ricerca normalizzata li equipara
+        codice = codice.replace('.', generatore.choice('-_'))
+    if generatore.random() < 0.5:
+        revisioni = generatore.randint(0, 3)
+        nomi = [f"{codice}.mi"] + [f"{codice}_v{n}.mi" for n in range(1, revisioni + 1)]
+        nomi.append(f"{codice}_v{revisioni}.pdf" if revisioni else f"{codice}.pdf")
+        return nomi
+    nomi = [f"{codice}.prt.{n}" for n in range(1, generatore.randint(1, 6) + 1)]
+    if generatore.random() < 0.4:
+        nomi += [f"{codice}.drw.{n}" for n in range(1, generatore.randint(1, 3) + 1)]
+    return nomi
+
+def _cartelle_foglia(radice: str, profondita: int, ramificazione: int) -> List[str]:
+    livello = [radice]
+    for n in range(profondita):
+        livello = [os.path.join(cartella, f"l{n}_{i:03d}") for cartella in livello for i in range(ramificazione)]
+    return livello
+
+def genera_archivio(radice: str, file: int, profondita: int, ramificazione: int, seme: int = 1) -> dict:
+    """Crea l'archivio sintetico, oppure riusa quello già presente se generato con gli stessi parametri.
+
+    Restituisce il manifesto: parametri e codici dei disegni creati.
+    """
+    parametri = {"file": file, "profondita": profondita, "ramificazione": ramificazione, "seme": seme}
+    percorso_manifesto = os.path.join(radice, MANIFESTO_ARCHIVIO)
+    try:
+        with open(percorso_manifesto, encoding='utf-8') as manifesto:
+            esistente = json.load(manifesto)
+        if esistente["parametri"] == parametri:
+            return esistente
+    except (OSError, ValueError, KeyError):
+        pass
+    if os.path.exists(radice) and os.listdir(radice):
+        raise SystemExit(f"{radice} non è vuota e non contiene un archivio generato con questi parametri")
+
+    generatore = random.Random(seme)
+    foglie = _cartelle_foglia(radice, profondita, ramificazione)
+    codici = []
+    creati = 0
+    while creati < file:
+        cartella = foglie[len(codici) % len(foglie)]
+        codice = _codice(generatore)
+        os.makedirs(cartella, exist_ok=True)
+        for nome in _nomi_disegno(generatore, codice)[:file - creati]:
+            open(os.path.join(cartella, nome), 'wb').close()
+            creati += 1
+        codici.append(codice)
+
+    manifesto = {"parametri": parametri, "cartelle": len(foglie), "codici": codici}
+    with open(percorso_manifesto, 'w', encoding='utf-8') as uscita:
+        json.dump(manifesto, uscita)
+    return manifesto
+
+@contextmanager
+def latenza(millisecondi: float):
+    """Aggiunge un'attesa a ogni elenco di cartella e a ogni stat, come su una condivisione SMB"""
+    if millisecondi <= 0:
+        yield
+        return
+    originali = os.scandir, os.stat
+    attesa = millisecondi / 1000
+
+    def scandir(*args, **kwargs):
+        time.sleep(attesa)
+        return originali[0](*args, **kwargs)
+
+    def stat(*args, **kwargs):
+        time.sleep(attesa)
+        return originali[1](*args, **kwargs)
+
+    os.scandir, os.stat = scandir, stat
+    try:
+        yield
+    finally:
+        os.scandir, os.stat = originali
+
+def cronometra(funzione: Callable[[], object], ripetizioni: int, prepara: Optional[Callable[[], None]] = None) -> dict:
+    """Esegue la funzione più volte e riporta tempo minimo e mediano in millisecondi"""
+    tempi = []
+    esito = None
+    for _ in range(ripetizioni):
+        if prepara is not None:
+            prepara()
+        inizio = time.perf_counter()
+        esito = funzione()
+        tempi.append((time.perf_counter() - inizio) * 1000)
+    return {
+        "ms_min": round(min(tempi), 3),
+        "ms_mediana": round(statistics.median(tempi), 3),
+        "ripetizioni": ripetizioni,
+        "trovati": _conta(esito)
+    }
+
+def _conta(esito) -> int:
+    if isinstance(esito, dict) and "risultati" in esito:
+        risultati = esito["risultati"]
+        if isinstance(risultati, dict):
+            return sum(len(voci) for voci in risultati.values())
+        return sum(1 for voce in risultati if not isinstance(voce, str))
+    return 0
+
+def _commit() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+def esegui(radice: str, manifesto: dict, ripetizioni: int, elenco: int, latenza_ms: float) -> Dict[str, dict]:
+    """Cronometra tutti gli scenari sull'archivio e restituisce i tempi per scenario"""
+    # I trigrammi sono facoltativi nell'applicazione ma fanno parte delle misure
+    INDEX_CONFIG['trigrams'] = True
+    # La scansione a freddo si misura senza riassunti, che hanno uno scenario a parte
+    SEARCH_CONFIG['summaries'] = False
+
+    generatore = random.Random(manifesto["parametri"]["seme"])
+    codice = generatore.choice(manifesto["codici"])
+    breve = codice[:3]
+    parte = codice[6:]
+    codici = generatore.sample(manifesto["codici"], min(elenco, len(manifesto["codici"])))
+    # Un codice su dieci della distinta non esiste nell'archivio
+    codici += [f"00000.{n:05d}" for n in range(max(1, elenco // 10))]
+
+    risultati = {}
+    with latenza(latenza_ms):
+        senza_indice = FileSearcher([radice])
+        risultati["scansione_prefisso"] = cronometra(lambda: senza_indice.cerca_file(codice), ripetizioni,
+                                                     senza_indice.invalida_cache)
+        risultati["scansione_prefisso_breve"] = cronometra(lambda: senza_indice.cerca_file(breve), ripetizioni,
+                                                           senza_indice.invalida_cache)
+        risultati["scansione_contiene"] = cronometra(lambda: senza_indice.cerca_file(parte, contiene=True),
+                                                     ripetizioni, senza_indice.invalida_cache)
+        risultati["scansione_elenco"] = cronometra(lambda: senza_indice.cerca_molti(codici), ripetizioni,
+                                                   senza_indice.invalida_cache)
+
+        # Con i riassunti la prima scansione li impara, le ricerche successive saltano i sottoalberi
+        SEARCH_CONFIG['summaries'] = True
+        con_riassunti = FileSearcher([radice])
+        SEARCH_CONFIG['summaries'] = False
+        con_riassunti.cerca_file(breve)
+        risultati["riassunti_prefisso"] = cronometra(lambda: con_riassunti.cerca_file(codice), ripetizioni,
+                                                     con_riassunti.invalida_cache)
+        risultati["riassunti_elenco"] = cronometra(lambda: con_riassunti.cerca_molti(codici), ripetizioni,
+                                                   con_riassunti.invalida_cache)
+
+        with tempfile.TemporaryDirectory() as temporanea:
+            indici = {
+                "memoria": lambda: IndiceMemoria(),
+                "sqlite": lambda: IndiceSQLite(os.path.join(temporanea, "indice.sqlite")),
+                "snapshot": lambda: IndiceSnapshot(os.path.join(temporanea, "indice.snapshot")),
+            }
+            for tipo, crea in indici.items():
+                indice = crea()
+                searcher = FileSearcher([radice], indice)
+                risultati[f"{tipo}_costruzione"] = cronometra(searcher.aggiorna_indice, 1)
+                risultati[f"{tipo}_aggiornamento"] = cronometra(searcher.aggiorna_indice, ripetizioni)
+                risultati[f"{tipo}_prefisso"] = cronometra(lambda: searcher.cerca_file(codice), ripetizioni,
+                                                           searcher.invalida_cache)
+                risultati[f"{tipo}_prefisso_breve"] = cronometra(lambda: searcher.cerca_file(breve), ripetizioni,
+                                                                 searcher.invalida_cache)
+                risultati[f"{tipo}_contiene"] = cronometra(lambda: searcher.cerca_file(parte, contiene=True),
+                                                           ripetizioni, searcher.invalida_cache)
+                risultati[f"{tipo}_elenco"] = cronometra(lambda: searcher.cerca_molti(codici), ripetizioni,
+                                                         searcher.invalida_cache)
+                indice.chiudi()
+
+            # Avvio a freddo dallo snapshot salvato: apertura e prima ricerca
+            def avvio_snapshot():
+                indice = IndiceSnapshot(os.path.join(temporanea, "indice.snapshot"))
+                try:
+                    return FileSearcher([radice], indice).cerca_file(codice)
+                finally:
+                    indice.chiudi()
+            risultati["snapshot_avvio"] = cronometra(avvio_snapshot, ripetizioni)
+    return risultati
+
+def confronta(prima: str, dopo: str) -> None:
+    """Stampa i tempi mediani di due esecuzioni e il loro rapporto"""
+    with open(prima, encoding='utf-8') as file:
+        vecchio = json.load(file)
+    with open(dopo, encoding='utf-8') as file:
+        nuovo = json.load(file)
+    if vecchio["parametri"] != nuovo["parametri"]:
+        print("Attenzione: le due esecuzioni hanno parametri diversi")
+    print(f"{'scenario':<28}{vecchio.get('commit') or 'prima':>14}{nuovo.get('commit') or 'dopo':>14}{'rapporto':>10}")
+    for scenario, tempi in nuovo["risultati"].items():
+        precedente = vecchio["risultati"].get(scenario)
+        if precedente is None:
+            print(f"{scenario:<28}{'-':>14}{tempi['ms_mediana']:>14.1f}{'-':>10}")
+            continue
+        rapporto = tempi['ms_mediana'] / precedente['ms_mediana'] if precedente['ms_mediana'] else float('inf')
+        print(f"{scenario:<28}{precedente['ms_mediana']:>14.1f}{tempi['ms_mediana']:>14.1f}{rapporto:>9.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cronometra la ricerca su un archivio di disegni sintetico")
+    parser.add_argument('--archivio', default=os.path.join(tempfile.gettempdir(), 'pdm-benchmark'),
+                        help="cartella dell'archivio sintetico, creata se assente")
+    parser.add_argument('--file', type=int, default=50000, help="numero di file dell'archivio")
+    parser.add_argument('--profondita', type=int, default=3, help="livelli di cartelle sotto la radice")
+    parser.add_argument('--ramificazione', type=int, default=8, help="sottocartelle per cartella")
+    parser.add_argument('--seme', type=int, default=1, help="seme dei nomi generati")
+    parser.add_argument('--latenza-ms', type=float, default=0, help="attesa aggiunta a ogni elenco e stat")
+    parser.add_argument('--ripetizioni', type=int, default=5, help="ripetizioni di ogni misura")
+    parser.add_argument('--elenco', type=int, default=200, help="codici della ricerca per elenco")
+    parser.add_argument('--uscita', help="file JSON dei risultati (predefinito: benchmark-<data>.json)")
+    parser.add_argument('--confronta', nargs=2, metavar=('PRIMA', 'DOPO'), help="confronta due file di risultati")
+    argomenti = parser.parse_args()
+
+    if argomenti.confronta:
+        confronta(*argomenti.confronta)
+        return
+
+    manifesto = genera_archivio(argomenti.archivio, argomenti.file, argomenti.profondita,
+                                argomenti.ramificazione, argomenti.seme)
+    risultati = esegui(argomenti.archivio, manifesto, max(1, argomenti.ripetizioni), argomenti.elenco,
+                       argomenti.latenza_ms)
+
+    esito = {
+        "versione": VERSIONE_RISULTATI,
+        "app": APP_NAME,
+        "versione_app": APP_VERSION,
+        "commit": _commit(),
+        "data": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "piattaforma": platform.platform(),
+        "parametri": {**manifesto["parametri"], "latenza_ms": argomenti.latenza_ms, "elenco": argomenti.elenco},
+        "risultati": risultati
+    }
+    uscita = argomenti.uscita or f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(uscita, 'w', encoding='utf-8') as file:
+        json.dump(esito, file, indent=2)
+
+    for scenario, tempi in risultati.items():
+        print(f"{scenario:<28}{tempi['ms_mediana']:>12.1f} ms  (min {tempi['ms_min']:.1f}, trovati {tempi['trovati']})")
+    print(f"Risultati salvati in {uscita}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Ricerca da riga di comando, senza interfaccia grafica.
+
+Usa la stessa configurazione (.env), lo stesso indice e lo stesso servizio
+dell'applicazione ma non importa Qt: parte in poco tempo e funziona anche su
+macchine senza schermo. I prefissi si passano come argomenti oppure, uno per
+riga, sullo standard input. Ogni file trovato viene scritto subito come riga
+JSON (JSON Lines):
+
+    {"prefisso": "37202.60010", "percorso": "...", "nome": "...", "base": "...", "revisione": 1, "allegato": false,
+     "dimensione": 52311, "modificato": "2024-05-14T09:32:10"}
+
+Dimensione (in byte) e data di modifica sono quelle lette con l'elenco della cartella;
+se non sono note valgono 0 e null.
+
+Gli avvisi (es. cartella non raggiungibile) sono righe {"prefisso": ..., "avviso": ...}
+e ogni prefisso si chiude con {"prefisso": ..., "trovati": N}. Il codice di uscita
+è 0 se ogni prefisso ha almeno un file, 1 altrimenti.
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Iterable, List, Union
+from backend import FileSearcher
+from config import CARTELLE_DA_CERCARE, INDEX_CONFIG, SERVICE_CONFIG
+from distribuzione import crea_indice_condiviso
+from index import crea_indice
+from servizio import crea_client
+from voci import Voce
+
+def _argomenti() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cerca i file per prefisso e scrive i risultati come JSON Lines")
+    parser.add_argument('prefissi', nargs='*', help="prefissi da cercare; se assenti vengono letti dallo standard input")
+    parser.add_argument('-c', '--cartella', action='append', dest='cartelle', metavar='CARTELLA',
+                        help="cartella in cui cercare, ripetibile (predefinite: CARTELLE_DA_CERCARE)")
+    parser.add_argument('--contiene', action='store_true', help="cerca il testo in qualsiasi punto del nome")
+    parser.add_argument('--storico', action='store_true', help="include le revisioni e versioni precedenti")
+    parser.add_argument('--elenco', action='store_true',
+                        help="cerca tutti i prefissi con un solo passaggio e scrive i risultati alla fine")
+    parser.add_argument('--aggiorna', action='store_true', help="aggiorna l'indice prima di cercare")
+    return parser.parse_args()
+
+def _scrivi(riga: dict) -> None:
+    print(json.dumps(riga, ensure_ascii=False), flush=True)
+
+def _scrivi_risultati(prefisso: str, risultati: Iterable[Union[Voce, str]]) -> int:
+    """Scrive i file e gli avvisi di un prefisso man mano che arrivano; restituisce il numero di file"""
+    trovati = 0
+    for voce in risultati:
+        if FileSearcher.is_avviso(voce):
+            _scrivi({"prefisso": prefisso, "avviso": voce})
+            continue
+        trovati += 1
+        modificato = datetime.fromtimestamp(voce.modificato).isoformat(timespec='seconds') if voce.modificato else None
+        _scrivi({
+            "prefisso": prefisso,
+            "percorso": voce.percorso,
+            "nome": os.path.basename(voce.percorso),
+            "base": voce.base,
+            "revisione": voce.revisione,
+            "allegato": voce.allegato,
+            "dimensione": voce.dimensione,
+            "modificato": modificato
+        })
+    _scrivi({"prefisso": prefisso, "trovati": trovati})
+    return trovati
+
+def _cerca(file_searcher: FileSearcher, prefissi: List[str], argomenti: argparse.Namespace) -> bool:
+    """Cerca i prefissi e restituisce True se ognuno ha almeno un file"""
+    if argomenti.elenco:
+        risultato = file_searcher.cerca_molti(prefissi)
+        if "errore" in risultato:
+            _scrivi({"errore": risultato["errore"]})
+            return False
+        for avviso in risultato["avvisi"]:
+            _scrivi({"avviso": avviso})
+        for prefisso, voci in risultato["risultati"].items():
+            _scrivi_risultati(prefisso, voci)
+        return not risultato["mancanti"]
+
+    tutti = True
+    for prefisso in prefissi:
+        try:
+            trovati = _scrivi_risultati(prefisso, file_searcher.cerca_file_iter(prefisso, contiene=argomenti.contiene))
+        except ValueError as e:
+            _scrivi({"prefisso": prefisso, "errore": str(e)})
+            trovati = 0
+        tutti = tutti and trovati > 0
+    return tutti
+
+def main():
+    argomenti = _argomenti()
+    if argomenti.elenco and argomenti.contiene:
+        sys.exit("--elenco cerca solo per prefisso: non si può usare con --contiene")
+    # Le righe JSON sono sempre in UTF-8, anche dove la console usa un'altra codifica
+    sys.stdout.reconfigure(encoding='utf-8')
+    prefissi = argomenti.prefissi or FileSearcher.leggi_elenco(sys.stdin.read())
+    if not prefissi:
+        sys.exit("Nessun prefisso da cercare")
+
+    file_searcher = FileSearcher(argomenti.cartelle or CARTELLE_DA_CERCARE, crea_indice(INDEX_CONFIG),
+                                 crea_client(SERVICE_CONFIG), crea_indice_condiviso(INDEX_CONFIG))
+    file_searcher.mostra_storico = argomenti.storico
+    try:
+        if argomenti.aggiorna:
+            file_searcher.aggiorna_indice()
+        esito = _cerca(file_searcher, prefissi, argomenti)
+    except BrokenPipeError:
+        # Uscita letta solo in parte (es. | head): non è un errore, ma Python non deve più scriverci
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        esito = True
+    finally:
+        if file_searcher.indice is not None:
+            file_searcher.indice.chiudi()
+    sys.exit(0 if esito else 1)
+
+if __name__ == "__main__":
+    main()
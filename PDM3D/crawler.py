@@ -0,0 +1,604 @@
+import fnmatch
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from config import ERROR_MESSAGES
+from sommari import CartellaElencata, SommariCartelle, impronta
+from voci import InsiemePrefissi, Voce, normalizza, voce_da_percorso
+
+# Ogni quanto l'attesa dei risultati controlla annullamento e scadenze, in secondi
+_CONTROLLO = 0.1
+# Posizione degli avvisi aggiunti a scansione in corso: dopo i file già trovati nella radice
+_IN_CODA = (float('inf'), 0)
+
+
+def ordina_blocchi(blocchi: Iterable[Tuple[tuple, list]]) -> list:
+    """Unisce i blocchi (ordine, trovati) di una radice per sottoalbero e cartella, come cerca"""
+    return [voce for _, trovati in sorted(blocchi, key=lambda blocco: blocco[0]) for voce in trovati]
+
+
+def elenca_file(cartella: str) -> Tuple[List[os.DirEntry], List[str]]:
+    """Restituisce file e sottocartelle di una cartella, come os.walk senza seguire i link.
+
+    I file restano DirEntry, ordinati per nome come le sottocartelle: dimensione e data
+    di modifica si leggono con dati_file senza un'altra richiesta al file system.
+    """
+    file: List[os.DirEntry] = []
+    sottocartelle: List[str] = []
+    with os.scandir(cartella) as voci:
+        for voce in voci:
+            try:
+                is_dir = voce.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                file.append(voce)
+            elif not voce.is_symlink():
+                sottocartelle.append(voce.path)
+    file.sort(key=lambda voce: voce.name)
+    sottocartelle.sort()
+    return file, sottocartelle
+
+
+def elenca_cartella(cartella: str) -> Tuple[List[str], List[str]]:
+    """Come elenca_file, con i soli nomi dei file.
+
+    Entrambi gli elenchi sono ordinati, così l'ordine dei risultati non dipende dal file system.
+    """
+    file, sottocartelle = elenca_file(cartella)
+    return [voce.name for voce in file], sottocartelle
+
+
+def dati_file(voce: os.DirEntry) -> Tuple[int, float]:
+    """Dimensione e data di modifica di un file elencato, (0, 0) se non leggibili (es. link interrotto).
+
+    Su Windows arrivano con l'elenco della cartella, anche dalle condivisioni di rete; altrove
+    DirEntry li legge alla prima richiesta e li conserva.
+    """
+    try:
+        stato = voce.stat()
+    except OSError:
+        return 0, 0.0
+    return stato.st_size, stato.st_mtime
+
+
+def _unisci(espressioni: List[str]) -> List[re.Pattern]:
+    """Espressioni valide dello stesso tipo, se possibile in un'unica espressione: un solo confronto per cartella"""
+    if not espressioni:
+        return []
+    try:
+        return [re.compile('|'.join(espressioni), re.IGNORECASE)]
+    except re.error:
+        # Valide da sole ma non insieme (es. lo stesso gruppo con nome in due regole)
+        return [re.compile(espressione, re.IGNORECASE) for espressione in espressioni]
+
+
+class RegoleEsclusione:
+    """Cartelle da non scansionare né indicizzare, con tutto il loro sottoalbero (CARTELLE_ESCLUSE).
+
+    Ogni regola è un glob (es. OLD, *backup*, _trash) oppure, con il prefisso re:, un'espressione
+    regolare cercata in un punto qualsiasi del testo. Una regola senza / si confronta con il nome
+    della cartella, una regola con / con il percorso relativo alla radice (es. Clienti/*/OLD).
+    Maiuscole e minuscole non contano, come nei percorsi di Windows.
+
+    Una regola non valida (es. re:( ) viene ignorata e descritta in errori, senza
+    perdere le altre: chi cerca la riporta tra gli avvisi.
+    """
+
+    def __init__(self, regole: Iterable[str] = ()):
+        nomi: List[str] = []
+        percorsi: List[str] = []
+        self.errori: List[str] = []
+        for regola in regole:
+            if regola.startswith('re:'):
+                espressione = '.*?(?:' + regola[3:] + ')'
+                su_percorso = '/' in regola
+            else:
+                regola = regola.replace('\\', '/').strip('/')
+                espressione = fnmatch.translate(regola)
+                su_percorso = '/' in regola
+            try:
+                re.compile(espressione)
+            except re.error as e:
+                self.errori.append(ERROR_MESSAGES['invalid_exclusion'].format(rule=regola, error=str(e)))
+                continue
+            (percorsi if su_percorso else nomi).append(espressione)
+        self._nomi = _unisci(nomi)
+        self._percorsi = _unisci(percorsi)
+
+    def __bool__(self) -> bool:
+        return bool(self._nomi or self._percorsi)
+
+    def _esclusa(self, nome: str, relativo: str) -> bool:
+        return any(regola.match(nome) for regola in self._nomi) \
+            or any(regola.match(relativo) for regola in self._percorsi)
+
+    def filtra(self, radice: str, sottocartelle: List[str]) -> List[str]:
+        """Toglie dalle sottocartelle appena elencate quelle escluse, così il loro sottoalbero non viene letto"""
+        if not self:
+            return sottocartelle
+        return [
+            cartella for cartella in sottocartelle
+            if not self._esclusa(os.path.basename(cartella), os.path.relpath(cartella, radice).replace(os.sep, '/'))
+        ]
+
+    def contiene(self, radice: str, cartella: str) -> bool:
+        """Indica se la cartella o una delle sue antenate fino alla radice è esclusa"""
+        if not self:
+            return False
+        parti = os.path.relpath(cartella, radice).split(os.sep)
+        if parti[0] in (os.curdir, os.pardir):
+            return False
+        return any(self._esclusa(parti[i], '/'.join(parti[:i + 1])) for i in range(len(parti)))
+
+
+def _voci(file: List[os.DirEntry], normalizzati: List[str], corrisponde: Callable[[str], bool]) -> List[Voce]:
+    # Senza indice le chiavi di ricerca e di raggruppamento vengono calcolate durante la scansione,
+    # dimensione e data solo per i file trovati
+    return [
+        voce_da_percorso(voce.path, *dati_file(voce))
+        for voce, normalizzato in zip(file, normalizzati) if corrisponde(normalizzato)
+    ]
+
+
+def _criterio(prefisso: str, contiene: bool) -> Callable[[str], bool]:
+    """Confronto tra un nome normalizzato e il prefisso cercato"""
+    prefisso = normalizza(prefisso)
+
+    def corrisponde(normalizzato: str) -> bool:
+        return prefisso in normalizzato if contiene else normalizzato.startswith(prefisso)
+
+    return corrisponde
+
+
+class SondaCartelle:
+    """Verifica in parallelo che le radici siano raggiungibili, ricordandone l'esito per qualche secondo.
+
+    Su una condivisione scollegata anche os.path.exists può restare bloccato a lungo: ogni
+    verifica gira in un thread a sé e chi la chiede aspetta al massimo timeout secondi.
+    Una verifica ancora bloccata viene riutilizzata dalle ricerche successive invece di
+    avviarne un'altra, e quando finalmente risponde il suo esito sostituisce il mancato arrivo.
+    """
+
+    def __init__(self, timeout: float = 0, durata: float = 0):
+        self.timeout = timeout
+        self.durata = durata
+        self._lock = threading.Lock()
+        self._esiti: Dict[str, Tuple[Optional[bool], float]] = {}
+        self._in_corso: Dict[str, threading.Event] = {}
+
+    def verifica(self, cartelle: List[str]) -> Dict[str, Optional[bool]]:
+        """Per ogni cartella: True se esiste, False se non esiste, None se non ha risposto in tempo"""
+        adesso = time.monotonic()
+        esiti: Dict[str, Optional[bool]] = {}
+        attese: Dict[str, threading.Event] = {}
+        with self._lock:
+            for cartella in cartelle:
+                memorizzato = self._esiti.get(cartella)
+                if memorizzato is not None and memorizzato[1] > adesso:
+                    esiti[cartella] = memorizzato[0]
+                    continue
+                evento = self._in_corso.get(cartella)
+                if evento is None:
+                    evento = self._in_corso[cartella] = threading.Event()
+                    # Thread daemon: una verifica bloccata non impedisce di chiudere l'applicazione
+                    threading.Thread(target=self._verifica, args=(cartella, evento), daemon=True).start()
+                attese[cartella] = evento
+
+        limite = adesso + self.timeout
+        for cartella, evento in attese.items():
+            if evento.wait(max(0.0, limite - time.monotonic()) if self.timeout > 0 else None):
+                with self._lock:
+                    esiti[cartella] = self._esiti[cartella][0]
+                continue
+            esiti[cartella] = None
+            with self._lock:
+                # Le ricerche dei prossimi secondi non aspettano di nuovo la stessa cartella
+                if cartella in self._in_corso:
+                    self._esiti[cartella] = (None, time.monotonic() + self.durata)
+        return {cartella: esiti[cartella] for cartella in cartelle}
+
+    def _verifica(self, cartella: str, evento: threading.Event) -> None:
+        esito = os.path.exists(cartella)
+        with self._lock:
+            self._esiti[cartella] = (esito, time.monotonic() + self.durata)
+            del self._in_corso[cartella]
+        evento.set()
+
+
+class StatisticheRadice:
+    """Contatori e scadenza della scansione di una radice, aggiornati dai thread che ne elencano le cartelle"""
+
+    def __init__(self, timeout: float = 0):
+        self._lock = threading.Lock()
+        self.timeout = timeout
+        self.inizio = time.monotonic()
+        self.fine = self.inizio
+        # La scadenza parte con avvia(), quando la radice inizia davvero a essere letta
+        self.scadenza = float('inf')
+        self._avviata = False
+        self._scadenza_segnalata = False
+        self.cartelle = 0
+        self.file = 0
+        self.trovati = 0
+        self.cartella_lenta: Optional[str] = None
+        self.durata_lenta = 0.0
+        # Radice non letta per intero (irraggiungibile, scaduta o con errori): i risultati non vanno in cache
+        self.completa = True
+        # Impronte delle cartelle elencate e sottoalberi saltati grazie ai riassunti, se abilitati
+        self.elencate: Dict[str, CartellaElencata] = {}
+        self.saltate: List[str] = []
+
+    def avvia(self) -> None:
+        with self._lock:
+            if self._avviata:
+                return
+            self._avviata = True
+            self.inizio = self.fine = time.monotonic()
+            if self.timeout > 0:
+                self.scadenza = self.inizio + self.timeout
+
+    def scaduta(self) -> bool:
+        return time.monotonic() > self.scadenza
+
+    def segna_scadenza(self) -> bool:
+        """Chiude la radice come incompleta per scadenza; True solo la prima volta, per un solo avviso"""
+        with self._lock:
+            primo = not self._scadenza_segnalata
+            self._scadenza_segnalata = True
+            self.completa = False
+            self.fine = max(self.fine, time.monotonic())
+            return primo
+
+    def interrompi(self) -> None:
+        with self._lock:
+            self.completa = False
+            self.fine = max(self.fine, time.monotonic())
+
+    def registra(self, cartella: str, durata: float, file: int, trovati: int) -> None:
+        """Conta una cartella elencata in durata secondi, con i suoi file esaminati e trovati"""
+        with self._lock:
+            self.cartelle += 1
+            self.file += file
+            self.trovati += trovati
+            self.fine = max(self.fine, time.monotonic())
+            if durata > self.durata_lenta:
+                self.cartella_lenta, self.durata_lenta = cartella, durata
+
+    def salta(self, cartella: str) -> None:
+        with self._lock:
+            self.saltate.append(cartella)
+
+    def come_dizionario(self) -> dict:
+        with self._lock:
+            return {
+                "origine": "scansione",
+                "cartelle": self.cartelle,
+                "file": self.file,
+                "trovati": self.trovati,
+                "durata": round(self.fine - self.inizio, 4),
+                "cartella_lenta": self.cartella_lenta,
+                "durata_lenta": round(self.durata_lenta, 4),
+                "saltate": len(self.saltate),
+                "completa": self.completa
+            }
+
+
+class Crawler:
+    """Scansione parallela delle cartelle con un pool di thread limitato.
+
+    Il lavoro viene suddiviso per radice e per sottocartella di primo livello:
+    su una condivisione di rete il tempo è dominato dalla latenza, quindi più
+    elenchi in volo contemporaneamente riducono il tempo totale a quello della
+    radice più lenta. I risultati vengono riuniti sempre nello stesso ordine.
+
+    L'evento annulla viene controllato prima di ogni elenco di cartella: una
+    scansione annullata si ferma entro la cartella in corso di lettura.
+
+    Le radici sono isolate tra loro: prima della scansione la loro raggiungibilità
+    viene verificata in parallelo, i thread liberi vanno alla radice con meno cartelle
+    in lettura, e ogni radice ha una scadenza (timeout_radice secondi dall'inizio della
+    sua lettura, 0 = nessuna). Una radice che non risponde o che supera la scadenza
+    diventa un avviso con i file trovati fino a quel momento, senza trattenere le
+    altre; lo stesso vale per un errore a metà scansione. Le sottocartelle escluse
+    dalle regole non vengono mai elencate.
+
+    Con i riassunti (sommari) ogni scansione completa impara quali inizi di nome
+    contiene ciascun sottoalbero, e le ricerche per prefisso successive saltano i
+    sottoalberi che non possono contenere il prefisso; i sottoalberi saltati vengono
+    poi riletti in background per accorgersi dei file aggiunti nel frattempo.
+
+    Se viene passato un dizionario statistiche, al termine contiene per ogni radice
+    i contatori della scansione (cartelle elencate, file esaminati, trovati, durata e
+    cartella più lenta), per individuare la condivisione che rallenta la ricerca, e
+    se la radice è stata letta per intero.
+    """
+
+    def __init__(self, max_thread: int = 8, timeout_radice: float = 0, sonda: Optional[SondaCartelle] = None,
+                 esclusioni: Optional[RegoleEsclusione] = None, sommari: Optional[SommariCartelle] = None):
+        self.max_thread = max(1, max_thread)
+        self.timeout_radice = timeout_radice
+        self.sonda = sonda or SondaCartelle()
+        self.esclusioni = esclusioni or RegoleEsclusione()
+        self.sommari = sommari
+
+    def cerca(self, cartelle: List[str], prefisso: str, annulla: Optional[threading.Event] = None,
+              contiene: bool = False,
+              statistiche: Optional[Dict[str, dict]] = None) -> Dict[str, List[Union[Voce, str]]]:
+        """Restituisce, per ogni cartella, i file il cui nome inizia con il prefisso e gli eventuali avvisi.
+
+        Con contiene il testo può trovarsi in un punto qualsiasi del nome.
+        """
+        prefissi = None if contiene else [normalizza(prefisso)]
+        return self._raccogli(cartelle, _criterio(prefisso, contiene), annulla, statistiche, prefissi)
+
+    def cerca_molti(self, cartelle: List[str], prefissi: InsiemePrefissi, annulla: Optional[threading.Event] = None,
+                    statistiche: Optional[Dict[str, dict]] = None) -> Dict[str, List[Union[Voce, str]]]:
+        """Restituisce, per ogni cartella, i file il cui nome inizia con uno qualsiasi dei prefissi.
+
+        Le cartelle vengono elencate una sola volta per tutti i prefissi: il costo è quello
+        di una singola ricerca. Il chiamante assegna i file ai prefissi con prefissi.trova.
+        """
+        return self._raccogli(cartelle, prefissi.corrisponde, annulla, statistiche, prefissi.prefissi)
+
+    def _raccogli(self, cartelle: List[str], corrisponde: Callable[[str], bool], annulla: Optional[threading.Event],
+                  statistiche: Optional[Dict[str, dict]],
+                  prefissi: Optional[List[str]]) -> Dict[str, List[Union[Voce, str]]]:
+        blocchi: Dict[str, List[tuple]] = {cartella: [] for cartella in cartelle}
+
+        def raccogli(cartella: str, ordine: tuple, trovati: list) -> None:
+            blocchi[cartella].append((ordine, trovati))
+
+        self._esegui(cartelle, corrisponde, raccogli, lambda: annulla is not None and annulla.is_set(), statistiche,
+                     prefissi)
+        # I blocchi arrivano nell'ordine di completamento: vengono riordinati per sottoalbero e cartella
+        return {cartella: ordina_blocchi(elenco) for cartella, elenco in blocchi.items()}
+
+    def cerca_iter(self, cartelle: List[str], prefisso: str, annulla: Optional[threading.Event] = None,
+                   contiene: bool = False,
+                   statistiche: Optional[Dict[str, dict]] = None) -> Iterator[Tuple[str, tuple, list]]:
+        """Restituisce (cartella, ordine, file trovati) man mano che ogni cartella viene elencata.
+
+        I blocchi arrivano nell'ordine di completamento; ordina_blocchi li rimette
+        nell'ordine di cerca. Chiudere il generatore prima della fine annulla la
+        scansione ancora in corso.
+        """
+        coda: queue.Queue = queue.Queue()
+        fine = object()
+        interrompi = threading.Event()
+
+        def annullato() -> bool:
+            return interrompi.is_set() or (annulla is not None and annulla.is_set())
+
+        def produci() -> None:
+            try:
+                self._esegui(cartelle, _criterio(prefisso, contiene),
+                             lambda cartella, ordine, trovati: coda.put((cartella, ordine, trovati)), annullato,
+                             statistiche, None if contiene else [normalizza(prefisso)])
+                coda.put(fine)
+            except BaseException as e:
+                coda.put(e)
+
+        threading.Thread(target=produci, daemon=True).start()
+        try:
+            while True:
+                elemento = coda.get()
+                if elemento is fine or annullato():
+                    return
+                if isinstance(elemento, BaseException):
+                    raise elemento
+                yield elemento
+        finally:
+            interrompi.set()
+
+    def _esegui(self, cartelle: List[str], corrisponde: Callable[[str], bool],
+                emetti: Callable[[str, tuple, list], None], annullato: Callable[[], bool],
+                statistiche: Optional[Dict[str, dict]] = None, prefissi: Optional[List[str]] = None) -> None:
+        """Scansiona le cartelle chiamando emetti(cartella, ordine, trovati) per ogni cartella con risultati.
+
+        corrisponde riceve il nome normalizzato di ogni file e indica se è tra quelli cercati;
+        prefissi sono i prefissi normalizzati corrispondenti, se la ricerca è per prefisso,
+        e permettono di saltare i sottoalberi che secondo i riassunti non li contengono.
+        """
+        if not cartelle:
+            return
+        maschere = self.sommari.maschere(prefissi) if self.sommari is not None and prefissi else None
+
+        contatori = {}
+        raggiungibili = []
+        for cartella, esito in self.sonda.verifica(cartelle).items():
+            contatori[cartella] = StatisticheRadice(self.timeout_radice)
+            if esito:
+                raggiungibili.append(cartella)
+            elif esito is None:
+                contatori[cartella].interrompi()
+                emetti(cartella, (0, 0), [ERROR_MESSAGES['folder_unreachable'].format(folder=cartella)])
+            else:
+                emetti(cartella, (0, 0), [ERROR_MESSAGES['folder_not_exists'].format(folder=cartella)])
+
+        # Lavoro di ogni radice ancora da assegnare: (0, radice) per l'elenco della radice,
+        # poi (indice, sottocartella) per ogni sottoalbero
+        in_attesa = {cartella: deque([(0, cartella)]) for cartella in raggiungibili}
+        attivi = {cartella: 0 for cartella in raggiungibili}
+        in_corso: Dict[Future, Tuple[str, int]] = {}
+        # Un pool per radice: i thread fermi su una condivisione abbandonata restano nel suo pool
+        # e non occupano quelli delle altre radici. I thread in lettura restano max_thread in tutto,
+        # contando solo il lavoro delle radici non abbandonate
+        pool: Dict[str, ThreadPoolExecutor] = {}
+
+        def distribuisci() -> None:
+            # Ogni thread libero va alla radice con meno cartelle in lettura: una condivisione lenta
+            # non accoda i propri sottoalberi davanti a quelli delle altre radici
+            while len(in_corso) < self.max_thread:
+                pronte = [cartella for cartella in raggiungibili if in_attesa[cartella]]
+                if not pronte:
+                    return
+                cartella = min(pronte, key=lambda c: attivi[c])
+                indice, da_leggere = in_attesa[cartella].popleft()
+                if cartella not in pool:
+                    pool[cartella] = ThreadPoolExecutor(max_workers=self.max_thread)
+                if indice == 0:
+                    futuro = pool[cartella].submit(self._elenca_radice, cartella, corrisponde, contatori[cartella],
+                                                   maschere)
+                else:
+                    futuro = pool[cartella].submit(self._cerca_sottoalbero, cartella, indice, da_leggere, corrisponde,
+                                                   emetti, annullato, contatori[cartella], maschere)
+                in_corso[futuro] = (cartella, indice)
+                attivi[cartella] += 1
+
+        def scaduta(cartella: str) -> None:
+            # La radice viene abbandonata con i file trovati fin qui, anche se la scadenza l'ha notata un thread
+            if contatori[cartella].segna_scadenza():
+                emetti(cartella, _IN_CODA, [ERROR_MESSAGES['folder_timeout'].format(
+                    folder=cartella, seconds=f"{self.timeout_radice:g}"
+                )])
+
+        try:
+            distribuisci()
+            while in_corso and not annullato():
+                completati, _ = wait(in_corso, timeout=_CONTROLLO, return_when=FIRST_COMPLETED)
+                for futuro in completati:
+                    cartella, indice = in_corso.pop(futuro)
+                    attivi[cartella] -= 1
+                    try:
+                        risultato = futuro.result()
+                    except Exception as e:
+                        # I file già trovati nella radice restano tra i risultati
+                        contatori[cartella].interrompi()
+                        emetti(cartella, _IN_CODA,
+                               [ERROR_MESSAGES['folder_access_error'].format(folder=cartella, error=str(e))])
+                        continue
+                    if indice != 0:
+                        continue
+                    # Le sottocartelle di una radice vengono accodate appena la radice è elencata,
+                    # senza aspettare le radici più lente
+                    trovati, sottocartelle = risultato
+                    if trovati:
+                        emetti(cartella, (0, 0), trovati)
+                    in_attesa[cartella].extend(enumerate(sottocartelle, start=1))
+
+                # Una radice oltre la scadenza con lavoro ancora da fare viene abbandonata
+                for cartella in raggiungibili:
+                    if contatori[cartella].scaduta() and (in_attesa[cartella] or attivi[cartella]):
+                        scaduta(cartella)
+                        in_attesa[cartella].clear()
+                        attivi[cartella] = 0
+                        in_corso = {futuro: voce for futuro, voce in in_corso.items() if voce[0] != cartella}
+                        if cartella in pool:
+                            pool.pop(cartella).shutdown(wait=False, cancel_futures=True)
+                distribuisci()
+        finally:
+            # I thread fermi su una cartella che non risponde non vengono aspettati: finiranno da soli
+            for esecutore in pool.values():
+                esecutore.shutdown(wait=False, cancel_futures=True)
+
+        if statistiche is not None:
+            statistiche.update({cartella: contatore.come_dizionario() for cartella, contatore in contatori.items()})
+        if self.sommari is not None and not annullato():
+            self._impara(contatori, maschere)
+
+    def _leggi(self, radice: str, cartella: str, corrisponde: Callable[[str], bool], contatore: StatisticheRadice,
+               maschere: Optional[List[int]]) -> Tuple[List[Voce], List[str]]:
+        """Elenca una cartella e restituisce i file trovati e le sottocartelle da visitare.
+
+        Non vengono visitate le sottocartelle escluse dalle regole né quelle che, secondo i
+        riassunti, non contengono i prefissi cercati.
+        """
+        inizio = time.monotonic()
+        file, sottocartelle = elenca_file(cartella)
+        normalizzati = [normalizza(voce.name) for voce in file]
+        trovati = _voci(file, normalizzati, corrisponde)
+        contatore.registra(cartella, time.monotonic() - inizio, len(file), len(trovati))
+        sottocartelle = self.esclusioni.filtra(radice, sottocartelle)
+        if self.sommari is None:
+            return trovati, sottocartelle
+
+        contatore.elencate[cartella] = (impronta(normalizzati), sottocartelle)
+        da_visitare = []
+        for sottocartella in sottocartelle:
+            if self.sommari.esclude(sottocartella, maschere):
+                contatore.salta(sottocartella)
+            else:
+                da_visitare.append(sottocartella)
+        return trovati, da_visitare
+
+    def _impara(self, contatori: Dict[str, StatisticheRadice], maschere: Optional[List[int]]) -> None:
+        """Aggiorna i riassunti delle radici lette per intero e avvia la verifica dei sottoalberi saltati"""
+        da_verificare = []
+        for radice, contatore in contatori.items():
+            # Da una scansione parziale si imparerebbero sottoalberi senza i file non ancora letti
+            if contatore.completa and contatore.elencate:
+                self.sommari.impara(radice, contatore.elencate)
+            da_verificare.extend((radice, cartella) for cartella in self.sommari.prenota(contatore.saltate))
+        if da_verificare:
+            threading.Thread(target=self._verifica_saltate, args=(da_verificare, maschere), daemon=True).start()
+
+    def _verifica_saltate(self, da_verificare: List[Tuple[str, str]], maschere: Optional[List[int]]) -> None:
+        """Rilegge i sottoalberi saltati, dopo la ricerca, e ne aggiorna i riassunti"""
+        for radice, cartella in da_verificare:
+            elencate: Dict[str, CartellaElencata] = {}
+            da_visitare = [cartella]
+            try:
+                while da_visitare:
+                    corrente = da_visitare.pop()
+                    try:
+                        file, sottocartelle = elenca_cartella(corrente)
+                    except OSError:
+                        continue
+                    sottocartelle = self.esclusioni.filtra(radice, sottocartelle)
+                    elencate[corrente] = (impronta(normalizza(nome) for nome in file), sottocartelle)
+                    da_visitare.extend(sottocartelle)
+                self.sommari.impara(radice, elencate)
+            except Exception:
+                # La verifica è solo un miglioramento: al prossimo giro il sottoalbero verrà riletto
+                continue
+            finally:
+                self.sommari.rilascia([cartella])
+            if not self.sommari.esclude(cartella, maschere):
+                # Il sottoalbero saltato conteneva il prefisso: i risultati della ricerca erano incompleti
+                self.sommari.notifica(radice)
+
+    def _elenca_radice(self, cartella: str, corrisponde: Callable[[str], bool], contatore: StatisticheRadice,
+                       maschere: Optional[List[int]]) -> Tuple[list, List[str]]:
+        # L'esistenza della radice è già stata verificata dalla sonda
+        contatore.avvia()
+        try:
+            return self._leggi(cartella, cartella, corrisponde, contatore, maschere)
+        except PermissionError:
+            return [ERROR_MESSAGES['permission_denied'].format(folder=cartella)], []
+        except Exception as e:
+            return [ERROR_MESSAGES['folder_access_error'].format(folder=cartella, error=str(e))], []
+
+    def _cerca_sottoalbero(self, radice: str, indice: int, cartella: str, corrisponde: Callable[[str], bool],
+                           emetti: Callable[[str, tuple, list], None], annullato: Callable[[], bool],
+                           contatore: StatisticheRadice, maschere: Optional[List[int]]) -> None:
+        da_visitare = [cartella]
+        progressivo = 0
+        while da_visitare and not annullato() and not contatore.scaduta():
+            corrente = da_visitare.pop()
+            try:
+                trovati, sottocartelle = self._leggi(radice, corrente, corrisponde, contatore, maschere)
+            except OSError:
+                # Come os.walk: le cartelle illeggibili vengono ignorate
+                continue
+            except Exception as e:
+                # Un nome illeggibile non interrompe il resto del sottoalbero
+                contatore.interrompi()
+                emetti(radice, (indice, progressivo),
+                       [ERROR_MESSAGES['folder_access_error'].format(folder=corrente, error=str(e))])
+                progressivo += 1
+                continue
+            if trovati:
+                emetti(radice, (indice, progressivo), trovati)
+                progressivo += 1
+            da_visitare.extend(reversed(sottocartelle))
+        if da_visitare and contatore.scaduta() and contatore.segna_scadenza():
+            # Scaduta con cartelle ancora da leggere: la radice non è completa anche se questo era l'ultimo thread
+            emetti(radice, _IN_CODA, [ERROR_MESSAGES['folder_timeout'].format(
+                folder=radice, seconds=f"{contatore.timeout:g}"
+            )])
@@ -0,0 +1,177 @@
+"""Distribuzione dell'indice tramite la cartella condivisa dell'archivio.
+
+Una sola macchina costruisce periodicamente l'indice (python pubblica.py) e pubblica
+nella cartella condivisa uno snapshot completo seguito da piccoli file delta con le
+sole cartelle cambiate. I client scaricano lo snapshot una volta e poi solo i delta
+nuovi, invece di scansionare ciascuno l'intero archivio.
+
+Contenuto della cartella condivisa:
+    indice.json              manifesto: versione, data di generazione, radici, snapshot e delta da applicare
+    indice-000012.snapshot   snapshot completo, nel formato di index.py
+    delta-000013.json        cartelle modificate e rimosse rispetto alla versione precedente
+"""
+
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from index import ContenutoCartella, Indice, leggi_snapshot, scrivi_snapshot
+
+MANIFESTO = 'indice.json'
+
+# Stato pubblicato: (aggiornato, contenuto) di ogni radice
+StatoPubblicato = Dict[str, Tuple[float, Dict[str, ContenutoCartella]]]
+
+
+def _scrivi_atomico(percorso: str, dati: bytes) -> None:
+    # I client non devono mai leggere un file scritto a metà
+    temporaneo = percorso + '.tmp'
+    with open(temporaneo, 'wb') as file:
+        file.write(dati)
+    os.replace(temporaneo, percorso)
+
+
+class IndiceCondiviso:
+    """Snapshot e delta dell'indice pubblicati in una cartella condivisa"""
+
+    def __init__(self, cartella: str, validita_ore: float = 0, delta_massimi: int = 24):
+        self.cartella = cartella
+        self.validita_secondi = validita_ore * 3600
+        self.delta_massimi = max(0, delta_massimi)
+        # Manifesto già applicato all'indice locale: i successivi aggiornamenti scaricano solo i delta nuovi
+        self._applicato: Optional[dict] = None
+
+    def leggi_manifesto(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.cartella, MANIFESTO), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _scaduto(self, manifesto: dict) -> bool:
+        return bool(self.validita_secondi) and time.time() - manifesto['generato'] > self.validita_secondi
+
+    def _leggi_delta(self, nome: str) -> dict:
+        with open(os.path.join(self.cartella, nome), encoding='utf-8') as file:
+            delta = json.load(file)
+        for voce in delta['radici'].values():
+            voce['modificate'] = {cartella: tuple(contenuto) for cartella, contenuto in voce['modificate'].items()}
+        return delta
+
+    def _carica(self, manifesto: dict) -> StatoPubblicato:
+        """Ricostruisce lo stato pubblicato: snapshot completo più tutti i delta successivi"""
+        with open(os.path.join(self.cartella, manifesto['snapshot']), 'rb') as file:
+            stato = leggi_snapshot(file.read())
+        for nome in manifesto['delta']:
+            for radice, voce in self._leggi_delta(nome)['radici'].items():
+                contenuto = stato.get(radice, (0.0, {}))[1]
+                for cartella in voce['rimosse']:
+                    contenuto.pop(cartella, None)
+                contenuto.update(voce['modificate'])
+                stato[radice] = (voce['aggiornato'], contenuto)
+        return stato
+
+    def sincronizza(self, indice: Indice, radici: List[str]) -> Dict[str, int]:
+        """Porta l'indice locale all'ultima versione pubblicata.
+
+        Restituisce, per ogni radice servita dalla pubblicazione, il numero di cartelle
+        cambiate. Se la pubblicazione manca, non è leggibile o è più vecchia della
+        validità configurata restituisce un dizionario vuoto: le radici vanno scansionate.
+        """
+        manifesto = self.leggi_manifesto()
+        if manifesto is None or self._scaduto(manifesto):
+            return {}
+        servite = [radice for radice in radici if radice in manifesto['radici']]
+        cambiate = {radice: 0 for radice in servite}
+
+        applicato = self._applicato
+        try:
+            if (applicato is not None and applicato['snapshot'] == manifesto['snapshot']
+                    and manifesto['delta'][:len(applicato['delta'])] == applicato['delta']):
+                for nome in manifesto['delta'][len(applicato['delta']):]:
+                    for radice, voce in self._leggi_delta(nome)['radici'].items():
+                        if radice in cambiate:
+                            cambiate[radice] += indice.applica_delta(
+                                radice, voce['modificate'], voce['rimosse'], voce['aggiornato']
+                            )
+            else:
+                stato = self._carica(manifesto)
+                for radice in servite:
+                    aggiornato, contenuto = stato.get(radice, (0.0, {}))
+                    cambiate[radice] = indice.importa_radice(radice, contenuto, aggiornato)
+        except (OSError, ValueError, KeyError):
+            # Pubblicazione in corso o condivisione irraggiungibile: alla prossima si riparte dallo snapshot
+            self._applicato = None
+            return {}
+
+        self._applicato = manifesto
+        return cambiate
+
+    def pubblica(self, indice: Indice, radici: List[str]) -> Dict[str, int]:
+        """Pubblica l'indice attuale come nuova versione.
+
+        Di norma viene scritto solo un delta; uno snapshot completo viene scritto alla
+        prima pubblicazione, quando cambiano le radici o dopo delta_massimi delta.
+        """
+        adesso = time.time()
+        attuale: StatoPubblicato = {
+            radice: (adesso, indice.contenuto_radice(radice)) for radice in radici if indice.contiene_radice(radice)
+        }
+        precedente = self.leggi_manifesto()
+        versione = precedente['versione'] + 1 if precedente else 1
+        os.makedirs(self.cartella, exist_ok=True)
+
+        completo = (precedente is None or len(precedente['delta']) >= self.delta_massimi
+                    or sorted(precedente['radici']) != sorted(attuale))
+        if not completo:
+            try:
+                pubblicato = self._carica(precedente)
+            except (OSError, ValueError, KeyError):
+                completo = True
+
+        cartelle = 0
+        if completo:
+            nome = f'indice-{versione:06d}.snapshot'
+            temporaneo = os.path.join(self.cartella, nome + '.tmp')
+            scrivi_snapshot(temporaneo, attuale)
+            os.replace(temporaneo, os.path.join(self.cartella, nome))
+            manifesto = {"snapshot": nome, "delta": []}
+            cartelle = sum(len(contenuto) for _, contenuto in attuale.values())
+        else:
+            delta = {"versione": versione, "radici": {}}
+            for radice, (_, contenuto) in attuale.items():
+                vecchio = pubblicato.get(radice, (0.0, {}))[1]
+                modificate = {cartella: voce for cartella, voce in contenuto.items() if vecchio.get(cartella) != voce}
+                rimosse = [cartella for cartella in vecchio if cartella not in contenuto]
+                delta["radici"][radice] = {"aggiornato": adesso, "modificate": modificate, "rimosse": rimosse}
+                cartelle += len(modificate) + len(rimosse)
+            nome = f'delta-{versione:06d}.json'
+            _scrivi_atomico(os.path.join(self.cartella, nome), json.dumps(delta).encode('utf-8'))
+            manifesto = {"snapshot": precedente['snapshot'], "delta": precedente['delta'] + [nome]}
+
+        manifesto.update(versione=versione, generato=adesso, radici=sorted(attuale))
+        _scrivi_atomico(os.path.join(self.cartella, MANIFESTO), json.dumps(manifesto, indent=2).encode('utf-8'))
+        self._pulisci(manifesto, precedente)
+        return {"versione": versione, "completo": int(completo), "cartelle": cartelle}
+
+    def _pulisci(self, manifesto: dict, precedente: Optional[dict]) -> None:
+        # I file della versione precedente restano per i client che la stanno ancora scaricando
+        in_uso = {manifesto['snapshot'], *manifesto['delta']}
+        if precedente is not None:
+            in_uso.update([precedente['snapshot'], *precedente['delta']])
+        for percorso in glob.glob(os.path.join(self.cartella, 'indice-*.snapshot')) + \
+                glob.glob(os.path.join(self.cartella, 'delta-*.json')):
+            if os.path.basename(percorso) not in in_uso:
+                try:
+                    os.remove(percorso)
+                except OSError:
+                    pass
+
+
+def crea_indice_condiviso(config: dict) -> Optional[IndiceCondiviso]:
+    """Crea l'accesso all'indice condiviso descritto dalla configurazione, oppure None se non configurato"""
+    if not config.get('shared_path'):
+        return None
+    return IndiceCondiviso(config['shared_path'], config['shared_max_age_hours'], config['shared_max_deltas'])
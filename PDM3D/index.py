@@ -0,0 +1,919 @@
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from crawler import RegoleEsclusione, dati_file, elenca_file
+from voci import Voce, chiave_file, crea_voce, firma_chiavi, normalizza
+
+# Incrementare quando cambia lo schema: il database viene ricreato da zero
+SCHEMA_VERSION = 5
+# La versione registrata include la firma delle chiavi di ricerca e di raggruppamento:
+# cambiando la loro configurazione l'indice viene ricostruito
+VERSIONE_DB = (SCHEMA_VERSION << 24) | (firma_chiavi() & 0xFFFFFF)
+
+# I nomi dei file non possono contenere il carattere nullo
+SEPARATORE = "\0"
+
+# Snapshot binario: intestazione, elenco delle radici e sezioni allineate a 8 byte.
+# Gli array sono nell'ordine dei byte della macchina, riportato nel magic.
+VERSIONE_SNAPSHOT = 4
+MAGIC_SNAPSHOT = b'PDMIDX' + (b'LE' if sys.byteorder == 'little' else b'BE')
+_INTESTAZIONE = struct.Struct('<8sIII')  # magic, versione, firma delle chiavi, numero di radici
+_RADICE = struct.Struct('<d2Q14Q')       # aggiornato, numero cartelle, numero file, offset delle 14 sezioni
+
+# Stato noto di una cartella: (mtime, sottocartelle)
+StatoCartella = Tuple[float, List[str]]
+# Cartella da riscrivere nell'indice: (mtime, file, sottocartelle, dimensioni e date di modifica dei file)
+ContenutoCartella = Tuple[float, List[str], List[str], List[int], List[float]]
+
+
+def _leggi_cartella(cartella: str, mtime: float) -> ContenutoCartella:
+    """Elenca una cartella con dimensione e data di modifica di ogni file, lette con l'elenco stesso"""
+    file, sottocartelle = elenca_file(cartella)
+    dati = [dati_file(voce) for voce in file]
+    return (mtime, [voce.name for voce in file], sottocartelle,
+            [dimensione for dimensione, _ in dati], [modificato for _, modificato in dati])
+
+
+def limite_superiore(prefisso: str) -> str:
+    """Restituisce la più piccola stringa maggiore di tutte quelle che iniziano con il prefisso"""
+    ultimo = ord(prefisso[-1])
+    if ultimo >= 0x10FFFF:
+        return prefisso + chr(0x10FFFF)
+    return prefisso[:-1] + chr(ultimo + 1)
+
+
+class Indice(ABC):
+    """Interfaccia comune degli indici usati da FileSearcher.
+
+    Un indice che non implementa tutti i metodi astratti non può essere creato.
+    """
+
+    def __init__(self, validita_ore: float = 0):
+        self.validita_secondi = validita_ore * 3600
+        # Chiamati con (radice, modificate, rimosse) dopo ogni modifica, es. dall'indice dei trigrammi
+        self.ascoltatori: List[Callable[[str, Dict[str, ContenutoCartella], List[str]], None]] = []
+        # Sottoalberi da non indicizzare (CARTELLE_ESCLUSE). Le sottocartelle vengono registrate tutte e
+        # filtrate durante la visita: cambiando le regole basta un aggiornamento, senza ricostruire l'indice
+        self.esclusioni = RegoleEsclusione()
+
+    def _notifica(self, radice: str, modificate: Dict[str, ContenutoCartella], rimosse: List[str]) -> None:
+        if modificate or rimosse:
+            for ascoltatore in self.ascoltatori:
+                ascoltatore(radice, modificate, rimosse)
+
+    def _valido(self, aggiornato: float) -> bool:
+        return not self.validita_secondi or time.time() - aggiornato < self.validita_secondi
+
+    @abstractmethod
+    def contiene_radice(self, radice: str) -> bool:
+        """Indica se la radice è indicizzata e l'indice non è scaduto"""
+
+    @abstractmethod
+    def cerca_prefisso(self, radice: str, prefisso: str) -> List[Voce]:
+        """Restituisce i file della radice il cui nome normalizzato inizia con il prefisso normalizzato"""
+
+    def cerca_prefissi(self, radice: str, prefissi: Iterable[str]) -> Dict[str, List[Voce]]:
+        """Cerca più prefissi insieme: restituisce i file della radice per ogni prefisso normalizzato"""
+        return {prefisso: self.cerca_prefisso(radice, prefisso) for prefisso in {normalizza(p) for p in prefissi}}
+
+    @abstractmethod
+    def _stato_cartelle(self, radice: str) -> Dict[str, StatoCartella]:
+        """Restituisce mtime e sottocartelle registrati per ogni cartella della radice"""
+
+    @abstractmethod
+    def _applica_modifiche(self, radice: str, modificate: Dict[str, ContenutoCartella], rimosse: List[str],
+                           aggiornato: Optional[float] = None) -> None:
+        """Riscrive le cartelle modificate, elimina quelle rimosse e segna la radice come aggiornata.
+
+        aggiornato indica quando il contenuto è stato letto dal disco (predefinito: adesso).
+        """
+
+    @abstractmethod
+    def contenuto_radice(self, radice: str) -> Dict[str, ContenutoCartella]:
+        """Restituisce mtime, file e sottocartelle registrati per ogni cartella della radice"""
+
+    def applica_delta(self, radice: str, modificate: Dict[str, ContenutoCartella], rimosse: List[str],
+                      aggiornato: float) -> int:
+        """Applica cartelle modificate e rimosse lette altrove, ad esempio da un delta centrale"""
+        self._applica_modifiche(radice, modificate, rimosse, aggiornato)
+        return len(modificate) + len(rimosse)
+
+    def importa_radice(self, radice: str, contenuto: Dict[str, ContenutoCartella], aggiornato: float) -> int:
+        """Sostituisce il contenuto della radice con quello indicato, ad esempio da uno snapshot centrale.
+
+        Restituisce il numero di cartelle cambiate rispetto all'indice.
+        """
+        attuale = self.contenuto_radice(radice)
+        modificate = {cartella: voce for cartella, voce in contenuto.items() if attuale.get(cartella) != voce}
+        rimosse = [cartella for cartella in attuale if cartella not in contenuto]
+        self._applica_modifiche(radice, modificate, rimosse, aggiornato)
+        return len(modificate) + len(rimosse)
+
+    def aggiorna_radice(self, radice: str, completo: bool = False,
+                        annulla: Optional[threading.Event] = None) -> Optional[Dict[str, int]]:
+        """Aggiornamento incrementale della radice basato sull'mtime delle cartelle.
+
+        Una cartella con mtime invariato non viene rielencata: le sue sottocartelle
+        note vengono solo controllate con una stat. Restituisce il numero di cartelle
+        controllate, riscansionate e saltate, oppure None se la radice non è accessibile
+        o l'aggiornamento è stato annullato (in tal caso l'indice resta invariato).
+        """
+        if not os.path.isdir(radice):
+            return None
+
+        stato = self._stato_cartelle(radice)
+        modificate: Dict[str, ContenutoCartella] = {}
+        visitate = set()
+        statistiche = {"controllate": 0, "riscansionate": 0, "saltate": 0}
+
+        da_visitare = [radice]
+        while da_visitare:
+            if annulla is not None and annulla.is_set():
+                return None
+            cartella = da_visitare.pop()
+            try:
+                # L'mtime va letto prima dell'elenco: una modifica concorrente sarà vista al prossimo giro
+                mtime = os.stat(cartella).st_mtime
+            except OSError:
+                continue
+            visitate.add(cartella)
+            statistiche["controllate"] += 1
+
+            noto = None if completo else stato.get(cartella)
+            if noto is not None and noto[0] == mtime:
+                statistiche["saltate"] += 1
+                sottocartelle = noto[1]
+            else:
+                try:
+                    modificate[cartella] = _leggi_cartella(cartella, mtime)
+                except OSError:
+                    continue
+                statistiche["riscansionate"] += 1
+                sottocartelle = modificate[cartella][2]
+            # Le cartelle escluse non vengono visitate e, se già indicizzate, escono dall'indice
+            da_visitare.extend(reversed(self.esclusioni.filtra(radice, sottocartelle)))
+
+        rimosse = [cartella for cartella in stato if cartella not in visitate]
+        self._applica_modifiche(radice, modificate, rimosse)
+        return statistiche
+
+    def aggiorna_cartelle(self, radice: str, cartelle: Iterable[str]) -> Dict[str, int]:
+        """Rielenca solo le cartelle indicate, ad esempio quelle segnalate da un osservatore.
+
+        Le sottocartelle nuove vengono indicizzate per intero, quelle sparite vengono
+        rimosse con tutto il loro sottoalbero. Le modifiche sono applicate in un solo blocco.
+        """
+        stato = self._stato_cartelle(radice)
+        if not stato:
+            # Radice mai indicizzata: un aggiornamento parziale la renderebbe valida ma incompleta
+            return {"controllate": 0, "riscansionate": 0, "saltate": 0}
+        modificate: Dict[str, ContenutoCartella] = {}
+        rimosse: List[str] = []
+
+        da_visitare = [cartella for cartella in cartelle if not self.esclusioni.contiene(radice, cartella)]
+        while da_visitare:
+            cartella = da_visitare.pop()
+            if cartella in modificate:
+                continue
+            try:
+                modificate[cartella] = _leggi_cartella(cartella, os.stat(cartella).st_mtime)
+            except OSError:
+                rimosse.extend(self._sottoalbero(stato, cartella))
+                continue
+            sottocartelle = modificate[cartella][2]
+
+            precedenti = stato[cartella][1] if cartella in stato else []
+            da_visitare.extend(s for s in self.esclusioni.filtra(radice, sottocartelle) if s not in stato)
+            for sparita in set(precedenti) - set(sottocartelle):
+                rimosse.extend(self._sottoalbero(stato, sparita))
+
+        self._applica_modifiche(radice, modificate, rimosse)
+        return {"controllate": len(modificate) + len(rimosse), "riscansionate": len(modificate), "saltate": 0}
+
+    @staticmethod
+    def _sottoalbero(stato: Dict[str, StatoCartella], cartella: str) -> List[str]:
+        """Restituisce la cartella e tutte le sue discendenti note all'indice"""
+        risultato = []
+        da_visitare = [cartella]
+        while da_visitare:
+            corrente = da_visitare.pop()
+            if corrente in stato:
+                risultato.append(corrente)
+                da_visitare.extend(stato[corrente][1])
+        return risultato
+
+    def salva(self) -> None:
+        """Rende persistenti le modifiche, per gli indici che lo richiedono"""
+        pass
+
+    def chiudi(self) -> None:
+        pass
+
+
+class _RadiceInMemoria:
+    """Cartelle di una radice e file ordinati per nome normalizzato"""
+
+    def __init__(self):
+        self.cartelle: List[str] = []
+        self.id_per_percorso: Dict[str, int] = {}
+        self.mtime: Dict[int, float] = {}
+        self.file: Dict[int, List[str]] = {}
+        # Chiavi di raggruppamento dei file, calcolate una volta quando la cartella viene indicizzata
+        self.chiavi: Dict[int, List[str]] = {}
+        # Nomi normalizzati per la ricerca, calcolati anch'essi una volta per file
+        self.normalizzati: Dict[int, List[str]] = {}
+        self.sottocartelle: Dict[int, List[str]] = {}
+        self.dimensioni: Dict[int, List[int]] = {}
+        self.modificati: Dict[int, List[float]] = {}
+        # Nomi normalizzati ordinati con id delle cartelle, nomi, chiavi, dimensioni e date corrispondenti,
+        # sostituiti insieme in modo atomico
+        self.ordinati: Tuple[List[str], array, List[str], List[str], array, array] = \
+            ([], array('I'), [], [], array('q'), array('d'))
+        self.aggiornato = 0.0
+
+    def id_cartella(self, percorso: str) -> int:
+        cartella_id = self.id_per_percorso.get(percorso)
+        if cartella_id is None:
+            # Gli id non vengono mai riutilizzati, così le ricerche in corso restano coerenti
+            cartella_id = len(self.cartelle)
+            self.cartelle.append(percorso)
+            self.id_per_percorso[percorso] = cartella_id
+        return cartella_id
+
+    def imposta_cartella(self, percorso: str, mtime: float, file: List[str], sottocartelle: List[str],
+                         dimensioni: List[int], modificati: List[float]) -> None:
+        cartella_id = self.id_cartella(percorso)
+        self.mtime[cartella_id] = mtime
+        self.file[cartella_id] = file
+        self.chiavi[cartella_id] = [chiave_file(nome) for nome in file]
+        self.normalizzati[cartella_id] = [normalizza(nome) for nome in file]
+        self.sottocartelle[cartella_id] = sottocartelle
+        self.dimensioni[cartella_id] = dimensioni
+        self.modificati[cartella_id] = modificati
+
+    def rimuovi_cartella(self, percorso: str) -> None:
+        cartella_id = self.id_per_percorso.get(percorso)
+        if cartella_id is not None:
+            for campo in (self.mtime, self.file, self.chiavi, self.normalizzati, self.sottocartelle,
+                          self.dimensioni, self.modificati):
+                campo.pop(cartella_id, None)
+
+    def file_ordinati(self) -> List[Tuple[str, str, int, str, int, float]]:
+        """Restituisce (nome normalizzato, nome, id cartella, chiave, dimensione, data) di tutti i file, in ordine"""
+        return sorted(
+            (normalizzato, nome, cartella_id, chiave, dimensione, modificato)
+            for cartella_id, nomi in self.file.items()
+            for nome, chiave, normalizzato, dimensione, modificato in zip(
+                nomi, self.chiavi[cartella_id], self.normalizzati[cartella_id],
+                self.dimensioni[cartella_id], self.modificati[cartella_id]
+            )
+        )
+
+    def riordina(self) -> None:
+        ordinati = self.file_ordinati()
+        self.ordinati = (
+            [normalizzato for normalizzato, *_ in ordinati],
+            array('I', (cartella_id for _, _, cartella_id, *_ in ordinati)),
+            [nome for _, nome, *_ in ordinati],
+            [chiave for _, _, _, chiave, _, _ in ordinati],
+            array('q', (dimensione for *_, dimensione, _ in ordinati)),
+            array('d', (modificato for *_, modificato in ordinati))
+        )
+
+    def contenuto(self) -> Dict[str, ContenutoCartella]:
+        return {
+            self.cartelle[cartella_id]: (
+                mtime, self.file[cartella_id], self.sottocartelle[cartella_id],
+                self.dimensioni[cartella_id], self.modificati[cartella_id]
+            )
+            for cartella_id, mtime in self.mtime.items()
+        }
+
+    @classmethod
+    def da_contenuto(cls, contenuto: Dict[str, ContenutoCartella], aggiornato: float) -> "_RadiceInMemoria":
+        dati = cls()
+        for percorso, (mtime, file, sottocartelle, dimensioni, modificati) in contenuto.items():
+            dati.imposta_cartella(percorso, mtime, file, sottocartelle, dimensioni, modificati)
+        dati.riordina()
+        dati.aggiornato = aggiornato
+        return dati
+
+
+class IndiceMemoria(Indice):
+    """Indice in memoria: una ricerca per prefisso sono due bisect su un array ordinato"""
+
+    def __init__(self, validita_ore: float = 0):
+        super().__init__(validita_ore)
+        self._radici: Dict[str, _RadiceInMemoria] = {}
+        self._lock = threading.Lock()
+
+    def contiene_radice(self, radice: str) -> bool:
+        dati = self._radici.get(radice)
+        return dati is not None and self._valido(dati.aggiornato)
+
+    def cerca_prefisso(self, radice: str, prefisso: str) -> List[Voce]:
+        dati = self._radici.get(radice)
+        if dati is None:
+            return []
+
+        normalizzati = dati.ordinati[0]
+        prefisso = normalizza(prefisso)
+        inizio = bisect_left(normalizzati, prefisso)
+        return self._voci(dati, inizio, bisect_left(normalizzati, limite_superiore(prefisso), inizio))
+
+    def cerca_prefissi(self, radice: str, prefissi: Iterable[str]) -> Dict[str, List[Voce]]:
+        dati = self._radici.get(radice)
+        if dati is None:
+            return {}
+
+        # Prefissi in ordine: ogni ricerca binaria riparte da dove si è fermata la precedente
+        normalizzati = dati.ordinati[0]
+        trovati = {}
+        inizio = 0
+        for prefisso in sorted({normalizza(p) for p in prefissi}):
+            inizio = bisect_left(normalizzati, prefisso, inizio)
+            trovati[prefisso] = self._voci(dati, inizio, bisect_left(normalizzati, limite_superiore(prefisso), inizio))
+        return trovati
+
+    @staticmethod
+    def _voci(dati: _RadiceInMemoria, inizio: int, fine: int) -> List[Voce]:
+        _, id_cartelle, nomi, chiavi, dimensioni, modificati = dati.ordinati
+        trovati = sorted((id_cartelle[i], nomi[i], i) for i in range(inizio, fine))
+        return [
+            crea_voce(os.path.join(dati.cartelle[cartella_id], nome), chiavi[i], dimensioni[i], modificati[i])
+            for cartella_id, nome, i in trovati
+        ]
+
+    def _stato_cartelle(self, radice: str) -> Dict[str, StatoCartella]:
+        dati = self._radici.get(radice)
+        if dati is None:
+            return {}
+        with self._lock:
+            return {
+                dati.cartelle[cartella_id]: (mtime, dati.sottocartelle[cartella_id])
+                for cartella_id, mtime in dati.mtime.items()
+            }
+
+    def contenuto_radice(self, radice: str) -> Dict[str, ContenutoCartella]:
+        dati = self._radici.get(radice)
+        if dati is None:
+            return {}
+        with self._lock:
+            return dati.contenuto()
+
+    def _applica_modifiche(self, radice: str, modificate: Dict[str, ContenutoCartella], rimosse: List[str],
+                           aggiornato: Optional[float] = None) -> None:
+        with self._lock:
+            dati = self._radici.get(radice) or _RadiceInMemoria()
+            for percorso in rimosse:
+                dati.rimuovi_cartella(percorso)
+            for percorso, (mtime, file, sottocartelle, dimensioni, modificati) in modificate.items():
+                dati.imposta_cartella(percorso, mtime, file, sottocartelle, dimensioni, modificati)
+            if modificate or rimosse:
+                dati.riordina()
+            dati.aggiornato = aggiornato or time.time()
+            self._radici[radice] = dati
+        self._notifica(radice, modificate, rimosse)
+
+
+def _codifica(testo: str) -> bytes:
+    # surrogatepass conserva i nomi non decodificabili e l'ordine dei code point
+    return testo.encode('utf-8', 'surrogatepass')
+
+
+def _decodifica(dati) -> str:
+    return bytes(dati).decode('utf-8', 'surrogatepass')
+
+
+def _tabella_testi(testi: Iterable[bytes]) -> Tuple[bytes, bytes]:
+    """Restituisce gli offset (n + 1 interi a 64 bit) e i testi concatenati"""
+    testi = list(testi)
+    offset = array('Q', [0])
+    totale = 0
+    for testo in testi:
+        totale += len(testo)
+        offset.append(totale)
+    return offset.tobytes(), b''.join(testi)
+
+
+def _scrivi_snapshot(percorso: str, radici: Dict[str, _RadiceInMemoria]) -> None:
+    """Scrive le radici in memoria nel formato letto da _leggi_snapshot"""
+    elenco = []
+    for radice, dati in radici.items():
+        # Solo le cartelle ancora presenti, rinumerate da zero
+        ids = sorted(dati.mtime)
+        nuovo_id = {cartella_id: i for i, cartella_id in enumerate(ids)}
+        ordinati = dati.file_ordinati()
+        cartelle_offset, cartelle_testo = _tabella_testi(_codifica(dati.cartelle[i]) for i in ids)
+        sotto_offset, sotto_testo = _tabella_testi(_codifica(SEPARATORE.join(dati.sottocartelle[i])) for i in ids)
+        file_offset, file_testo = _tabella_testi(_codifica(nome) for _, nome, *_ in ordinati)
+        chiavi_offset, chiavi_testo = _tabella_testi(_codifica(chiave) for _, _, _, chiave, _, _ in ordinati)
+        normali_offset, normali_testo = _tabella_testi(_codifica(normalizzato) for normalizzato, *_ in ordinati)
+        sezioni = [
+            cartelle_offset, cartelle_testo, array('d', (dati.mtime[i] for i in ids)).tobytes(),
+            sotto_offset, sotto_testo,
+            file_offset, file_testo,
+            array('I', (nuovo_id[cartella_id] for _, _, cartella_id, *_ in ordinati)).tobytes(),
+            chiavi_offset, chiavi_testo,
+            normali_offset, normali_testo,
+            array('q', (dimensione for *_, dimensione, _ in ordinati)).tobytes(),
+            array('d', (modificato for *_, modificato in ordinati)).tobytes()
+        ]
+        elenco.append((_codifica(radice), dati.aggiornato, len(ids), len(ordinati), sezioni))
+
+    posizione = _INTESTAZIONE.size + sum(4 + len(nome) + _RADICE.size for nome, *_ in elenco)
+    with open(percorso, 'wb') as file:
+        file.write(_INTESTAZIONE.pack(MAGIC_SNAPSHOT, VERSIONE_SNAPSHOT, firma_chiavi(), len(elenco)))
+        disposizione = []
+        for nome, aggiornato, n_cartelle, n_file, sezioni in elenco:
+            offset = []
+            for sezione in sezioni:
+                posizione += -posizione % 8
+                offset.append(posizione)
+                posizione += len(sezione)
+            disposizione.append(offset)
+            file.write(struct.pack('<I', len(nome)) + nome + _RADICE.pack(aggiornato, n_cartelle, n_file, *offset))
+        for (_, _, _, _, sezioni), offset in zip(elenco, disposizione):
+            for sezione, inizio in zip(sezioni, offset):
+                file.write(b'\0' * (inizio - file.tell()))
+                file.write(sezione)
+
+
+class _NomiMappati:
+    """Sequenza di nomi file letti dallo snapshot senza copiarli in memoria"""
+
+    def __init__(self, offset: memoryview, testo: memoryview):
+        self._offset = offset
+        self._testo = testo
+
+    def __len__(self) -> int:
+        return len(self._offset) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._testo[self._offset[i]:self._offset[i + 1]].tobytes()
+
+
+class _RadiceMappata:
+    """Radice letta direttamente dallo snapshot mappato in memoria"""
+
+    def __init__(self, vista: memoryview, aggiornato: float, n_cartelle: int, n_file: int, sezioni: Tuple[int, ...]):
+        self.aggiornato = aggiornato
+
+        def interi(inizio: int, quanti: int, formato: str) -> memoryview:
+            return vista[inizio:inizio + quanti * struct.calcsize(formato)].cast(formato)
+
+        self._cartelle_offset = interi(sezioni[0], n_cartelle + 1, 'Q')
+        self._cartelle_testo = vista[sezioni[1]:sezioni[1] + self._cartelle_offset[-1]]
+        self._mtime = interi(sezioni[2], n_cartelle, 'd')
+        self._sotto_offset = interi(sezioni[3], n_cartelle + 1, 'Q')
+        self._sotto_testo = vista[sezioni[4]:sezioni[4] + self._sotto_offset[-1]]
+        self._file_offset = interi(sezioni[5], n_file + 1, 'Q')
+        self._file_testo = vista[sezioni[6]:sezioni[6] + self._file_offset[-1]]
+        self._file_cartella = interi(sezioni[7], n_file, 'I')
+        self._chiavi_offset = interi(sezioni[8], n_file + 1, 'Q')
+        self._chiavi_testo = vista[sezioni[9]:sezioni[9] + self._chiavi_offset[-1]]
+        self._normali_offset = interi(sezioni[10], n_file + 1, 'Q')
+        self._normali_testo = vista[sezioni[11]:sezioni[11] + self._normali_offset[-1]]
+        self._dimensioni = interi(sezioni[12], n_file, 'q')
+        self._modificati = interi(sezioni[13], n_file, 'd')
+        self._nomi = _NomiMappati(self._file_offset, self._file_testo)
+        # I file sono ordinati per nome normalizzato: è la sequenza su cui si fa il bisect
+        self._normalizzati = _NomiMappati(self._normali_offset, self._normali_testo)
+
+    def _cartella(self, i: int) -> str:
+        return _decodifica(self._cartelle_testo[self._cartelle_offset[i]:self._cartelle_offset[i + 1]])
+
+    def _sottocartelle(self, i: int) -> List[str]:
+        testo = _decodifica(self._sotto_testo[self._sotto_offset[i]:self._sotto_offset[i + 1]])
+        return testo.split(SEPARATORE) if testo else []
+
+    def _chiave(self, i: int) -> str:
+        return _decodifica(self._chiavi_testo[self._chiavi_offset[i]:self._chiavi_offset[i + 1]])
+
+    def cerca_prefisso(self, prefisso: str) -> List[Voce]:
+        return self.cerca_prefissi([prefisso])[normalizza(prefisso)]
+
+    def cerca_prefissi(self, prefissi: Iterable[str]) -> Dict[str, List[Voce]]:
+        trovati = {}
+        inizio = 0
+        for prefisso in sorted({normalizza(p) for p in prefissi}):
+            inizio = bisect_left(self._normalizzati, _codifica(prefisso), inizio)
+            fine = bisect_left(self._normalizzati, _codifica(limite_superiore(prefisso)), inizio)
+            trovati[prefisso] = self._voci(inizio, fine)
+        return trovati
+
+    def _voci(self, inizio: int, fine: int) -> List[Voce]:
+        trovati = sorted((self._file_cartella[i], _decodifica(self._nomi[i]), i) for i in range(inizio, fine))
+        return [
+            crea_voce(os.path.join(self._cartella(cartella_id), nome), self._chiave(i), self._dimensioni[i],
+                      self._modificati[i])
+            for cartella_id, nome, i in trovati
+        ]
+
+    def stato_cartelle(self) -> Dict[str, StatoCartella]:
+        return {self._cartella(i): (self._mtime[i], self._sottocartelle(i)) for i in range(len(self._mtime))}
+
+    def contenuto(self) -> Dict[str, ContenutoCartella]:
+        file: List[List[Tuple[str, int, float]]] = [[] for _ in range(len(self._mtime))]
+        for i in range(len(self._nomi)):
+            file[self._file_cartella[i]].append((_decodifica(self._nomi[i]), self._dimensioni[i], self._modificati[i]))
+        contenuto = {}
+        for i, elenco in enumerate(file):
+            # Stesso ordine dell'elenco della cartella, per confrontare il contenuto con altri indici
+            elenco.sort()
+            contenuto[self._cartella(i)] = (
+                self._mtime[i], [nome for nome, _, _ in elenco], self._sottocartelle(i),
+                [dimensione for _, dimensione, _ in elenco], [modificato for _, _, modificato in elenco]
+            )
+        return contenuto
+
+    def carica(self) -> _RadiceInMemoria:
+        """Copia la radice in memoria, per poterla modificare"""
+        return _RadiceInMemoria.da_contenuto(self.contenuto(), self.aggiornato)
+
+    def rilascia(self) -> None:
+        for vista in (self._cartelle_offset, self._cartelle_testo, self._mtime, self._sotto_offset,
+                      self._sotto_testo, self._file_offset, self._file_testo, self._file_cartella,
+                      self._chiavi_offset, self._chiavi_testo, self._normali_offset, self._normali_testo,
+                      self._dimensioni, self._modificati):
+            vista.release()
+
+
+def _leggi_snapshot(vista: memoryview, controlla_chiavi: bool = True) -> Dict[str, _RadiceMappata]:
+    """Legge l'elenco delle radici dello snapshot; le sezioni restano sul file mappato.
+
+    Le chiavi salvate sono usabili solo se calcolate con la stessa configurazione:
+    chi legge solo nomi e cartelle può ignorarne la firma.
+    """
+    magic, versione, firma, n_radici = _INTESTAZIONE.unpack_from(vista, 0)
+    if magic != MAGIC_SNAPSHOT or versione != VERSIONE_SNAPSHOT:
+        raise ValueError("snapshot di un'altra versione")
+    if controlla_chiavi and firma != firma_chiavi():
+        raise ValueError("snapshot con un'altra configurazione del raggruppamento")
+
+    radici = {}
+    posizione = _INTESTAZIONE.size
+    for _ in range(n_radici):
+        (lunghezza,) = struct.unpack_from('<I', vista, posizione)
+        radice = _decodifica(vista[posizione + 4:posizione + 4 + lunghezza])
+        posizione += 4 + lunghezza
+        aggiornato, n_cartelle, n_file, *sezioni = _RADICE.unpack_from(vista, posizione)
+        posizione += _RADICE.size
+        radici[radice] = _RadiceMappata(vista, aggiornato, n_cartelle, n_file, tuple(sezioni))
+    return radici
+
+
+def scrivi_snapshot(percorso: str, radici: Dict[str, Tuple[float, Dict[str, ContenutoCartella]]]) -> None:
+    """Scrive uno snapshot a partire da (aggiornato, contenuto) di ogni radice"""
+    _scrivi_snapshot(percorso, {
+        radice: _RadiceInMemoria.da_contenuto(contenuto, aggiornato)
+        for radice, (aggiornato, contenuto) in radici.items()
+    })
+
+
+def leggi_snapshot(dati: bytes) -> Dict[str, Tuple[float, Dict[str, ContenutoCartella]]]:
+    """Legge (aggiornato, contenuto) di ogni radice da uno snapshot già caricato in memoria"""
+    with memoryview(dati) as vista:
+        radici = _leggi_snapshot(vista, controlla_chiavi=False)
+        try:
+            return {radice: (mappata.aggiornato, mappata.contenuto()) for radice, mappata in radici.items()}
+        finally:
+            for mappata in radici.values():
+                mappata.rilascia()
+
+
+class IndiceSnapshot(IndiceMemoria):
+    """Indice in memoria salvato su disco come snapshot binario.
+
+    All'avvio lo snapshot viene mappato con mmap e interrogato direttamente, senza
+    caricarlo: il tempo di avvio non dipende dalla dimensione dell'archivio. Una radice
+    viene copiata in memoria solo quando l'aggiornamento incrementale vi trova modifiche;
+    salva() riscrive lo snapshot se qualcosa è cambiato dall'ultimo salvataggio. Un
+    aggiornamento senza modifiche sposta solo la data della radice, che viene salvata in
+    un piccolo file accanto allo snapshot senza riscriverlo.
+    """
+
+    def __init__(self, percorso: str, validita_ore: float = 0):
+        super().__init__(validita_ore)
+        self.percorso = percorso
+        self._file = None
+        self._mappa: Optional[mmap.mmap] = None
+        self._mappate: Dict[str, _RadiceMappata] = {}
+        self._da_salvare = False
+        # Date di aggiornamento più recenti di quelle scritte nello snapshot
+        self.percorso_aggiornati = percorso + '.aggiornato'
+        self._aggiornati: Dict[str, float] = {}
+        self._aggiornati_da_salvare = False
+        self._apri()
+
+    def _apri(self) -> None:
+        try:
+            self._file = open(self.percorso, 'rb')
+            self._mappa = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            with memoryview(self._mappa) as vista:
+                self._mappate = _leggi_snapshot(vista)
+        except (OSError, ValueError, struct.error):
+            # Snapshot assente, vuoto o di un'altra versione: l'indice riparte da zero
+            self._chiudi_mappa()
+            return
+        try:
+            with open(self.percorso_aggiornati, encoding='utf-8') as file:
+                self._aggiornati = {radice: float(aggiornato) for radice, aggiornato in json.load(file).items()}
+        except (OSError, ValueError, AttributeError):
+            return
+        for radice, aggiornato in self._aggiornati.items():
+            mappata = self._mappate.get(radice)
+            if mappata is not None and aggiornato > mappata.aggiornato:
+                mappata.aggiornato = aggiornato
+
+    def _chiudi_mappa(self) -> None:
+        for mappata in self._mappate.values():
+            mappata.rilascia()
+        self._mappate = {}
+        if self._mappa is not None:
+            self._mappa.close()
+            self._mappa = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def contiene_radice(self, radice: str) -> bool:
+        mappata = self._mappate.get(radice)
+        if mappata is not None:
+            return self._valido(mappata.aggiornato)
+        return super().contiene_radice(radice)
+
+    def cerca_prefisso(self, radice: str, prefisso: str) -> List[Voce]:
+        with self._lock:
+            mappata = self._mappate.get(radice)
+            if mappata is not None:
+                return mappata.cerca_prefisso(prefisso)
+        return super().cerca_prefisso(radice, prefisso)
+
+    def cerca_prefissi(self, radice: str, prefissi: Iterable[str]) -> Dict[str, List[Voce]]:
+        with self._lock:
+            mappata = self._mappate.get(radice)
+            if mappata is not None:
+                return mappata.cerca_prefissi(prefissi)
+        return super().cerca_prefissi(radice, prefissi)
+
+    def _stato_cartelle(self, radice: str) -> Dict[str, StatoCartella]:
+        with self._lock:
+            mappata = self._mappate.get(radice)
+            if mappata is not None:
+                return mappata.stato_cartelle()
+        return super()._stato_cartelle(radice)
+
+    def contenuto_radice(self, radice: str) -> Dict[str, ContenutoCartella]:
+        with self._lock:
+            mappata = self._mappate.get(radice)
+            if mappata is not None:
+                return mappata.contenuto()
+        return super().contenuto_radice(radice)
+
+    def _applica_modifiche(self, radice: str, modificate: Dict[str, ContenutoCartella], rimosse: List[str],
+                           aggiornato: Optional[float] = None) -> None:
+        with self._lock:
+            if not modificate and not rimosse:
+                # Cambia solo la data: lo snapshot resta mappato e non va riscritto
+                self._aggiornati[radice] = aggiornato or time.time()
+                self._aggiornati_da_salvare = True
+                mappata = self._mappate.get(radice)
+                if mappata is not None:
+                    mappata.aggiornato = self._aggiornati[radice]
+                    return
+            else:
+                self._da_salvare = True
+                mappata = self._mappate.get(radice)
+                if mappata is not None:
+                    self._radici[radice] = mappata.carica()
+                    del self._mappate[radice]
+        super()._applica_modifiche(radice, modificate, rimosse, aggiornato)
+
+    def _salva_aggiornati(self) -> None:
+        temporaneo = self.percorso_aggiornati + '.tmp'
+        try:
+            with open(temporaneo, 'w', encoding='utf-8') as file:
+                json.dump(self._aggiornati, file)
+            os.replace(temporaneo, self.percorso_aggiornati)
+        except OSError:
+            return
+        self._aggiornati_da_salvare = False
+
+    def salva(self) -> None:
+        with self._lock:
+            if not self._da_salvare:
+                if self._aggiornati_da_salvare:
+                    self._salva_aggiornati()
+                return
+            # Il file mappato va chiuso prima di essere sostituito (obbligatorio su Windows)
+            for radice, mappata in self._mappate.items():
+                self._radici[radice] = mappata.carica()
+            self._chiudi_mappa()
+            temporaneo = self.percorso + '.tmp'
+            try:
+                _scrivi_snapshot(temporaneo, self._radici)
+                os.replace(temporaneo, self.percorso)
+            except OSError:
+                # Si riproverà al prossimo salvataggio; l'indice in memoria resta valido
+                return
+            self._da_salvare = False
+            # Lo snapshot appena scritto contiene già le date più recenti
+            self._aggiornati = {}
+            self._aggiornati_da_salvare = False
+            try:
+                os.remove(self.percorso_aggiornati)
+            except OSError:
+                pass
+
+    def chiudi(self) -> None:
+        self.salva()
+        with self._lock:
+            self._chiudi_mappa()
+
+
+class IndiceSQLite(Indice):
+    """Indice persistente dei nomi file su SQLite, con B-tree sul nome normalizzato"""
+
+    def __init__(self, percorso_db: str, validita_ore: float = 0):
+        super().__init__(validita_ore)
+        self.percorso_db = percorso_db
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(percorso_db, check_same_thread=False)
+        self._crea_schema()
+
+    def _crea_schema(self) -> None:
+        with self._lock, self._conn:
+            versione = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if versione != VERSIONE_DB:
+                self._conn.executescript("""
+                    DROP TABLE IF EXISTS file;
+                    DROP TABLE IF EXISTS cartelle;
+                    DROP TABLE IF EXISTS radici;
+                """)
+            self._conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS radici (
+                    percorso TEXT PRIMARY KEY,
+                    aggiornato REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS cartelle (
+                    id INTEGER PRIMARY KEY,
+                    radice TEXT NOT NULL,
+                    percorso TEXT NOT NULL,
+                    mtime REAL NOT NULL,
+                    sottocartelle TEXT NOT NULL,
+                    UNIQUE (radice, percorso)
+                );
+                CREATE TABLE IF NOT EXISTS file (
+                    nome TEXT NOT NULL,
+                    chiave TEXT NOT NULL,
+                    normalizzato TEXT NOT NULL,
+                    cartella_id INTEGER NOT NULL,
+                    dimensione INTEGER NOT NULL,
+                    modificato REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_file_normalizzato ON file(normalizzato);
+                CREATE INDEX IF NOT EXISTS idx_file_cartella ON file(cartella_id);
+                PRAGMA user_version = {VERSIONE_DB};
+            """)
+
+    def contiene_radice(self, radice: str) -> bool:
+        with self._lock:
+            riga = self._conn.execute(
+                "SELECT aggiornato FROM radici WHERE percorso = ?", (radice,)
+            ).fetchone()
+        return riga is not None and self._valido(riga[0])
+
+    def cerca_prefisso(self, radice: str, prefisso: str) -> List[Voce]:
+        # Range scan sull'indice del nome normalizzato. Senza statistiche SQLite preferirebbe
+        # partire dalle cartelle della radice e leggerne tutti i file: l'indice va imposto
+        prefisso = normalizza(prefisso)
+        with self._lock:
+            righe = self._conn.execute(
+                """
+                SELECT c.percorso, f.nome, f.chiave, f.dimensione, f.modificato
+                FROM file f INDEXED BY idx_file_normalizzato JOIN cartelle c ON c.id = f.cartella_id
+                WHERE f.normalizzato >= ? AND f.normalizzato < ? AND c.radice = ?
+                ORDER BY c.id, f.nome
+                """,
+                (prefisso, limite_superiore(prefisso), radice)
+            ).fetchall()
+        return [
+            crea_voce(os.path.join(percorso, nome), chiave, dimensione, modificato)
+            for percorso, nome, chiave, dimensione, modificato in righe
+        ]
+
+    def _stato_cartelle(self, radice: str) -> Dict[str, StatoCartella]:
+        with self._lock:
+            righe = self._conn.execute(
+                "SELECT percorso, mtime, sottocartelle FROM cartelle WHERE radice = ?", (radice,)
+            ).fetchall()
+        return {
+            percorso: (mtime, sottocartelle.split(SEPARATORE) if sottocartelle else [])
+            for percorso, mtime, sottocartelle in righe
+        }
+
+    def contenuto_radice(self, radice: str) -> Dict[str, ContenutoCartella]:
+        with self._lock:
+            cartelle = self._conn.execute(
+                "SELECT id, percorso, mtime, sottocartelle FROM cartelle WHERE radice = ?", (radice,)
+            ).fetchall()
+            righe = self._conn.execute(
+                """
+                SELECT f.cartella_id, f.nome, f.dimensione, f.modificato
+                FROM file f JOIN cartelle c ON c.id = f.cartella_id
+                WHERE c.radice = ?
+                ORDER BY f.nome
+                """,
+                (radice,)
+            ).fetchall()
+        file: Dict[int, Tuple[List[str], List[int], List[float]]] = {
+            cartella_id: ([], [], []) for cartella_id, *_ in cartelle
+        }
+        for cartella_id, nome, dimensione, modificato in righe:
+            nomi, dimensioni, modificati = file[cartella_id]
+            nomi.append(nome)
+            dimensioni.append(dimensione)
+            modificati.append(modificato)
+        return {
+            percorso: (
+                mtime, file[cartella_id][0], sottocartelle.split(SEPARATORE) if sottocartelle else [],
+                file[cartella_id][1], file[cartella_id][2]
+            )
+            for cartella_id, percorso, mtime, sottocartelle in cartelle
+        }
+
+    def _applica_modifiche(self, radice: str, modificate: Dict[str, ContenutoCartella], rimosse: List[str],
+                           aggiornato: Optional[float] = None) -> None:
+        # Tutte le modifiche della radice vengono applicate in un'unica transazione
+        with self._lock, self._conn:
+            for percorso in rimosse:
+                self._rimuovi_cartella(radice, percorso)
+            for percorso, (mtime, file, sottocartelle, dimensioni, modificati) in modificate.items():
+                elenco = SEPARATORE.join(sottocartelle)
+                riga = self._conn.execute(
+                    "SELECT id FROM cartelle WHERE radice = ? AND percorso = ?", (radice, percorso)
+                ).fetchone()
+                if riga is None:
+                    cartella_id = self._conn.execute(
+                        "INSERT INTO cartelle (radice, percorso, mtime, sottocartelle) VALUES (?, ?, ?, ?)",
+                        (radice, percorso, mtime, elenco)
+                    ).lastrowid
+                else:
+                    cartella_id = riga[0]
+                    self._conn.execute(
+                        "UPDATE cartelle SET mtime = ?, sottocartelle = ? WHERE id = ?", (mtime, elenco, cartella_id)
+                    )
+                    self._conn.execute("DELETE FROM file WHERE cartella_id = ?", (cartella_id,))
+                self._conn.executemany(
+                    "INSERT INTO file (nome, chiave, normalizzato, cartella_id, dimensione, modificato) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (nome, chiave_file(nome), normalizza(nome), cartella_id, dimensione, modificato)
+                        for nome, dimensione, modificato in zip(file, dimensioni, modificati)
+                    )
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO radici (percorso, aggiornato) VALUES (?, ?)",
+                (radice, aggiornato or time.time())
+            )
+        self._notifica(radice, modificate, rimosse)
+
+    def _rimuovi_cartella(self, radice: str, percorso: str) -> None:
+        riga = self._conn.execute(
+            "SELECT id FROM cartelle WHERE radice = ? AND percorso = ?", (radice, percorso)
+        ).fetchone()
+        if riga is not None:
+            self._conn.execute("DELETE FROM file WHERE cartella_id = ?", (riga[0],))
+            self._conn.execute("DELETE FROM cartelle WHERE id = ?", (riga[0],))
+
+    def chiudi(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def crea_indice(config: dict) -> Optional[Indice]:
+    """Crea l'indice descritto dalla configurazione, oppure None se disabilitato"""
+    if not config.get('enabled'):
+        return None
+
+    validita_ore = config.get('max_age_hours') or 0
+    if config.get('type') == 'memoria':
+        indice = IndiceMemoria(validita_ore=validita_ore)
+    elif config.get('type') == 'snapshot':
+        percorso = config.get('path') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'indice.snapshot')
+        indice = IndiceSnapshot(percorso, validita_ore=validita_ore)
+    else:
+        percorso = config.get('path') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'indice.sqlite')
+        indice = IndiceSQLite(percorso, validita_ore=validita_ore)
+    indice.esclusioni = RegoleEsclusione(config.get('exclude') or [])
+    return indice
@@ -0,0 +1,134 @@
+"""Riassunti dei sottoalberi delle cartelle, per saltare durante la scansione quelli senza il prefisso cercato.
+
+Ogni scansione completa di una radice lascia, per ogni cartella elencata, un filtro di
+Bloom con gli inizi (da MINIMO a LUNGHEZZA caratteri) dei nomi normalizzati di tutti i
+file del suo sottoalbero. Le ricerche successive, anche senza indice, non scendono nei
+sottoalberi il cui filtro esclude il prefisso: i codici sono strutturati e un cliente o
+un progetto vive in poche cartelle, quindi la gran parte dell'archivio viene saltata.
+
+Il filtro può dare falsi positivi (una cartella visitata inutilmente) ma non falsi
+negativi rispetto a quanto visto dall'ultima scansione. I file aggiunti dopo vengono
+scoperti dalla verifica in background dei sottoalberi saltati, che rilegge ciascuno al
+più ogni verifica_secondi secondi e aggiorna i riassunti; se un sottoalbero saltato
+conteneva invece il prefisso, gli ascoltatori vengono avvisati (es. per svuotare la cache).
+I riassunti vivono in memoria per la durata del processo.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+MINIMO = 3
+LUNGHEZZA = 6
+BIT = 2048
+
+# Impronta propria di una cartella e sue sottocartelle visitabili, raccolte durante la scansione
+CartellaElencata = Tuple[int, List[str]]
+
+
+def _maschera(testa: str) -> int:
+    # Tre posizioni ricavate da un solo hash: il valore di hash delle stringhe è già in cache
+    h = hash(testa)
+    return (1 << (h & (BIT - 1))) | (1 << ((h >> 11) & (BIT - 1))) | (1 << ((h >> 22) & (BIT - 1)))
+
+
+def impronta(normalizzati: Iterable[str]) -> int:
+    """Filtro di Bloom degli inizi dei nomi normalizzati di una cartella"""
+    bit = 0
+    for testa in {n[:k] for n in normalizzati for k in range(MINIMO, min(len(n), LUNGHEZZA) + 1)}:
+        bit |= _maschera(testa)
+    return bit
+
+
+class SommariCartelle:
+    """Riassunti dei sottoalberi imparati dalle scansioni, condivisi tra le ricerche"""
+
+    def __init__(self, verifica_secondi: float = 300):
+        self.verifica_secondi = verifica_secondi
+        self._lock = threading.Lock()
+        # Cartella -> (filtro del sottoalbero, momento in cui è stato imparato)
+        self._sommari: Dict[str, Tuple[int, float]] = {}
+        self._in_verifica: Set[str] = set()
+        # Chiamati con la radice quando un sottoalbero saltato conteneva il prefisso cercato
+        self.ascoltatori: List[Callable[[str], None]] = []
+
+    @staticmethod
+    def maschere(prefissi: Iterable[str]) -> Optional[List[int]]:
+        """Maschere dei prefissi normalizzati da cercare, oppure None se uno è troppo corto per saltare"""
+        maschere = set()
+        for prefisso in prefissi:
+            if len(prefisso) < MINIMO:
+                return None
+            maschere.add(_maschera(prefisso[:LUNGHEZZA]))
+        return list(maschere) or None
+
+    def esclude(self, cartella: str, maschere: Optional[List[int]]) -> bool:
+        """Indica se all'ultima scansione il sottoalbero non conteneva file con nessuno dei prefissi"""
+        if maschere is None:
+            return False
+        sommario = self._sommari.get(cartella)
+        if sommario is None:
+            return False
+        return not any(sommario[0] & maschera == maschera for maschera in maschere)
+
+    def impara(self, radice: str, elencate: Dict[str, CartellaElencata]) -> None:
+        """Calcola i riassunti delle cartelle elencate, dalle più profonde alla radice.
+
+        Le sottocartelle non elencate (saltate) contribuiscono con il riassunto precedente;
+        senza riassunto (es. illeggibili) il sottoalbero che le contiene resta sconosciuto
+        e verrà sempre visitato. Le cartelle superiori già note ricevono i nuovi inizi.
+        """
+        adesso = time.monotonic()
+        with self._lock:
+            totali: Dict[str, Optional[int]] = {}
+            # Una sottocartella ha sempre un percorso più lungo della cartella che la contiene
+            for cartella in sorted(elencate, key=len, reverse=True):
+                bit, sottocartelle = elencate[cartella]
+                for sottocartella in sottocartelle:
+                    figlio = totali[sottocartella] if sottocartella in totali else \
+                        self._sommari.get(sottocartella, (None, 0))[0]
+                    if figlio is None:
+                        bit = None
+                        break
+                    bit |= figlio
+                totali[cartella] = bit
+
+            for cartella, bit in totali.items():
+                if bit is None:
+                    self._sommari.pop(cartella, None)
+                else:
+                    self._sommari[cartella] = (bit, adesso)
+                superiore = os.path.dirname(cartella)
+                if superiore in totali or cartella == radice:
+                    continue
+                # Sottoalbero riletto da solo: i suoi inizi salgono fino alla radice, e se è diventato
+                # sconosciuto lo diventano anche le cartelle che lo contengono
+                while len(superiore) >= len(radice) and superiore in self._sommari:
+                    if bit is None:
+                        del self._sommari[superiore]
+                    else:
+                        precedente, imparato = self._sommari[superiore]
+                        self._sommari[superiore] = (precedente | bit, imparato)
+                    if superiore == radice:
+                        break
+                    superiore = os.path.dirname(superiore)
+
+    def prenota(self, saltate: Iterable[str]) -> List[str]:
+        """Sceglie i sottoalberi saltati da verificare: non verificati di recente né già in verifica"""
+        limite = time.monotonic() - self.verifica_secondi
+        with self._lock:
+            scelte = [
+                cartella for cartella in dict.fromkeys(saltate)
+                if cartella not in self._in_verifica and self._sommari.get(cartella, (0, limite))[1] <= limite
+            ]
+            self._in_verifica.update(scelte)
+        return scelte
+
+    def rilascia(self, cartelle: Iterable[str]) -> None:
+        with self._lock:
+            self._in_verifica.difference_update(cartelle)
+
+    def notifica(self, radice: str) -> None:
+        for ascoltatore in self.ascoltatori:
+            ascoltatore(radice)
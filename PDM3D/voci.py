@@ -0,0 +1,206 @@
+import os
+import re
+import zlib
+from typing import Dict, Iterable, List, NamedTuple, Tuple, Union
+from config import GROUPING_CONFIG, SEARCH_CONFIG
+
+# I nomi dei file non possono contenere il carattere nullo
+SEPARATORE_CHIAVE = "\0"
+
+# Nome disegno con revisione facoltativa: 37202.60010_v1.mi -> (37202.60010, 1, mi)
+_REVISIONE = re.compile(r'^(?P<base>.+?)(?:_v(?P<revisione>\d+))?\.(?P<estensione>[^.]+)$', re.IGNORECASE)
+# Versione numerica salvata da Creo: part.prt.37 -> (part.prt, 37)
+_VERSIONE_CREO = re.compile(r'^(?P<base>.+\.[^.\d][^.]*)\.(?P<versione>\d+)$')
+# Separatori ignorati dalla ricerca normalizzata: 37202.60010, 37202-60010 e 37202 60010 si equivalgono
+_SEPARATORI = re.compile(r'[.\-_\s]+')
+
+
+class Voce(NamedTuple):
+    """File trovato dalla ricerca, con i dati di raggruppamento calcolati in indicizzazione"""
+    percorso: str
+    base: str               # disegno o modello a cui appartiene il file
+    revisione: int          # revisione o versione Creo, 0 se il nome non la riporta
+    allegato: bool          # formato di accompagnamento (es. PDF) del file principale
+    dimensione: int = 0     # in byte, letta con l'elenco della cartella (0 se non nota)
+    modificato: float = 0.0  # data di modifica come timestamp, letta con l'elenco (0 se non nota)
+
+
+def normalizza(testo: str) -> str:
+    """Chiave di ricerca di un nome o di un prefisso: senza maiuscole e senza separatori.
+
+    Gli indici la calcolano una volta per file e ordinano i file per chiave; il prefisso
+    cercato viene normalizzato allo stesso modo. Con RICERCA_NORMALIZZATA=false il
+    confronto resta quello esatto sul nome.
+    """
+    if not SEARCH_CONFIG['normalize']:
+        return testo
+    return _SEPARATORI.sub('', testo.casefold())
+
+
+class InsiemePrefissi:
+    """Prefissi cercati insieme, ad esempio i codici di una distinta base.
+
+    I prefissi normalizzati sono tenuti in un insieme e ne sono annotate le lunghezze
+    distinte: per sapere quali prefissi iniziano un nome basta cercare nell'insieme
+    le sue prime lettere una volta per lunghezza (di norma una o due, perché i codici
+    di una distinta hanno la stessa forma), senza confrontare il nome con ogni prefisso.
+    """
+
+    def __init__(self, prefissi: Iterable[str]):
+        self.prefissi = sorted({normalizza(prefisso) for prefisso in prefissi} - {''})
+        self._insieme = set(self.prefissi)
+        self._lunghezze = sorted({len(prefisso) for prefisso in self.prefissi})
+
+    def __len__(self) -> int:
+        return len(self.prefissi)
+
+    def trova(self, normalizzato: str) -> List[str]:
+        """Restituisce i prefissi con cui inizia il nome normalizzato"""
+        trovati = []
+        for lunghezza in self._lunghezze:
+            if lunghezza > len(normalizzato):
+                break
+            if normalizzato[:lunghezza] in self._insieme:
+                trovati.append(normalizzato[:lunghezza])
+        return trovati
+
+    def corrisponde(self, normalizzato: str) -> bool:
+        return any(
+            normalizzato[:lunghezza] in self._insieme for lunghezza in self._lunghezze if lunghezza <= len(normalizzato)
+        )
+
+
+def chiave_file(nome: str) -> str:
+    """Calcola la chiave di raggruppamento di un nome file: base, revisione e famiglia dell'estensione.
+
+    Con il raggruppamento "revisioni" la base è il numero di disegno (nome_vN.mi), con
+    "versioni_creo" è il nome del modello con la sua estensione (part.prt.N); in entrambi
+    i casi è normalizzata, così 37202.60010 e 37202-60010 finiscono nello stesso gruppo.
+
+    Viene calcolata una volta per file quando il file entra nell'indice (o durante la
+    scansione) e conservata come stringa, così le ricerche non rileggono i nomi.
+    """
+    base, revisione, allegato = nome, 0, False
+    if GROUPING_CONFIG['mode'] == 'revisioni':
+        corrispondenza = _REVISIONE.match(nome)
+        if corrispondenza:
+            base = normalizza(corrispondenza['base'])
+            revisione = int(corrispondenza['revisione'] or 0)
+            allegato = corrispondenza['estensione'].lower() in GROUPING_CONFIG['attachments']
+    elif GROUPING_CONFIG['mode'] == 'versioni_creo':
+        corrispondenza = _VERSIONE_CREO.match(nome)
+        if corrispondenza:
+            base = normalizza(corrispondenza['base'])
+            revisione = int(corrispondenza['versione'])
+    return SEPARATORE_CHIAVE.join((base, str(revisione), '1' if allegato else ''))
+
+
+def firma_chiavi() -> int:
+    """Identifica la configurazione delle chiavi: gli indici salvati con un'altra firma vanno ricostruiti"""
+    configurazione = (GROUPING_CONFIG['mode'], sorted(GROUPING_CONFIG['attachments']), SEARCH_CONFIG['normalize'])
+    return zlib.crc32(repr(configurazione).encode('utf-8'))
+
+
+def chiave_gruppo(voce: Voce) -> Tuple[str, str]:
+    """Gruppo di un file: lo stesso disegno nella stessa cartella.
+
+    Disegni con lo stesso nome in cartelle o radici diverse restano separati; senza
+    raggruppamento ogni file è un gruppo a sé, anche se il nome si ripete altrove.
+    """
+    if GROUPING_CONFIG['mode'] not in ('revisioni', 'versioni_creo'):
+        return voce.percorso, ''
+    return os.path.dirname(voce.percorso), voce.base
+
+
+def crea_voce(percorso: str, chiave: str, dimensione: int = 0, modificato: float = 0.0) -> Voce:
+    base, revisione, allegato = chiave.split(SEPARATORE_CHIAVE)
+    return Voce(percorso, base, int(revisione), bool(allegato), dimensione, modificato)
+
+
+def voce_da_percorso(percorso: str, dimensione: int = 0, modificato: float = 0.0) -> Voce:
+    """Voce di un file trovato senza indice: la chiave viene calcolata al momento"""
+    return crea_voce(percorso, chiave_file(os.path.basename(percorso)), dimensione, modificato)
+
+
+def piu_recenti(risultati: Iterable[Union[Voce, str]]) -> List[Union[Voce, str]]:
+    """Ordina i file dal modificato più di recente, con gli avvisi in testa.
+
+    La data viene dall'elenco della cartella (scansione o indice), quindi ordinare non
+    richiede altri accessi al file system. Raggruppando il risultato, i disegni seguono
+    l'ordine del loro file più recente.
+    """
+    risultati = list(risultati)
+    avvisi = [voce for voce in risultati if isinstance(voce, str)]
+    file = sorted((voce for voce in risultati if not isinstance(voce, str)), key=lambda voce: -voce.modificato)
+    return avvisi + file
+
+
+def ultime_versioni(risultati: List[Union[Voce, str]]) -> List[Union[Voce, str]]:
+    """Tiene solo la versione più recente di ogni file in ogni cartella, mantenendo gli avvisi.
+
+    Le versioni di Creo sono salvate sempre nella stessa cartella del modello: basta
+    confrontare i file di uno stesso blocco di risultati.
+    """
+    recenti: Dict[tuple, int] = {}
+    for posizione, voce in enumerate(risultati):
+        if isinstance(voce, str):
+            continue
+        chiave = chiave_gruppo(voce)
+        migliore = recenti.get(chiave)
+        if migliore is None or voce.revisione > risultati[migliore].revisione:
+            recenti[chiave] = posizione
+    tenute = set(recenti.values())
+    return [voce for posizione, voce in enumerate(risultati) if isinstance(voce, str) or posizione in tenute]
+
+
+class Gruppo:
+    """File dello stesso disegno: la revisione più recente, i suoi allegati e le revisioni precedenti"""
+
+    def __init__(self, base: str):
+        self.base = base
+        self.voci: List[Voce] = []
+
+    def aggiungi(self, voce: Voce) -> None:
+        self.voci.append(voce)
+
+    def ordinate(self) -> List[Voce]:
+        """Revisione più recente per prima, ogni file principale seguito dai propri allegati"""
+        return sorted(self.voci, key=lambda voce: (-voce.revisione, voce.allegato))
+
+    @property
+    def principale(self) -> Voce:
+        return self.ordinate()[0]
+
+    @property
+    def allegati(self) -> List[Voce]:
+        principale = self.principale
+        return [
+            voce for voce in self.voci
+            if voce.allegato and voce.revisione == principale.revisione and voce is not principale
+        ]
+
+    @property
+    def precedenti(self) -> List[Voce]:
+        """Gli altri file del gruppo (revisioni precedenti, copie e loro allegati), dalla revisione più recente"""
+        esclusi = [self.principale, *self.allegati]
+        return [voce for voce in self.ordinate() if voce not in esclusi]
+
+
+def raggruppa(risultati: Iterable[Union[Voce, str]]) -> List[Union[Gruppo, str]]:
+    """Riunisce le voci per disegno, nell'ordine in cui compare il primo file di ogni gruppo.
+
+    Gli avvisi (stringhe) restano al loro posto.
+    """
+    gruppi: Dict[Tuple[str, str], Gruppo] = {}
+    elenco: List[Union[Gruppo, str]] = []
+    for voce in risultati:
+        if isinstance(voce, str):
+            elenco.append(voce)
+            continue
+        chiave = chiave_gruppo(voce)
+        gruppo = gruppi.get(chiave)
+        if gruppo is None:
+            gruppo = gruppi[chiave] = Gruppo(voce.base)
+            elenco.append(gruppo)
+        gruppo.aggiungi(voce)
+    return elenco